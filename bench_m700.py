@@ -0,0 +1,156 @@
+# coding: utf-8
+'''
+M700関連の性能計測スクリプト。
+
+使い方:
+    python bench_m700.py collector 192.168.1.10:683 192.168.1.11:683 --seconds 30
+    python bench_m700.py collector 192.168.1.10:683 192.168.1.11:683 --trace trace.jsonl
+    python bench_m700.py import --budget 20
+    python bench_m700.py pipeline 192.168.1.10:683 --repeat 100
+    python bench_m700.py replay trace.jsonl 192.168.1.10:683 --find-dir M01:¥PRG¥USER¥ --devs M900 D200
+'''
+import argparse
+import functools
+import statistics
+import subprocess
+import sys
+import time
+
+from m700 import M700
+from m700_collector import Collector
+from m700_trace import ReplayEZCom
+
+
+def bench_collector(args):
+    '''スレッド方式とプロセス方式で、同じホスト群を同じ時間収集した際の更新回数を比較する。
+    トレースを指定した場合は、全ホストでトレースを再生し、実機なしで計測する。
+    '''
+    backend = None
+    if args.trace:
+        backend = functools.partial(ReplayEZCom, args.trace, speed=args.speed)
+    for mode in (Collector.Mode.THREAD, Collector.Mode.PROCESS):
+        collector = Collector(args.hosts, args.metrics, interval=args.interval, mode=mode, workers=args.workers, backend=backend)
+        cpu = time.process_time()
+        with collector:
+            time.sleep(args.seconds)
+            result = collector.read_all()
+        cpu = time.process_time() - cpu
+        updates = sum(r['count'] for r in result.values())
+        errors = sum(1 for r in result.values() if not r['ok'])
+        print('{:8s} updates={:8d} ({:10.1f}/s) error_hosts={:4d} parent_cpu={:.2f}s'.format(
+            mode, updates, updates / args.seconds, errors, cpu))
+
+
+def bench_import(args):
+    '''新しいインタプリタで import m700 にかかる時間を計測し、予算[ミリ秒]を超えたら終了コード1を返す。
+    利用時に読み込むべきモジュール（pywin32、pipeline用のconcurrent.futures、inspect）が読み込まれた場合も終了コード1を返す。
+    '''
+    lazy = ('pythoncom', 'concurrent.futures', 'inspect', 'logging')
+    code = ('import sys, time; t = time.perf_counter(); import m700; t = time.perf_counter() - t; '
+            'print(t, *[m for m in {!r} if m in sys.modules])'.format(lazy))
+    times = []
+    for _ in range(args.repeat):
+        out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True).split()
+        times.append(float(out[0]) * 1000)
+        if out[1:]:
+            print('import m700 で次のモジュールが読み込まれています: ' + ', '.join(out[1:]))
+            sys.exit(1)
+    median = statistics.median(times)
+    print('import m700: median={:.1f}ms min={:.1f}ms max={:.1f}ms budget={:.1f}ms'.format(
+        median, min(times), max(times), args.budget))
+    if median > args.budget:
+        sys.exit(1)
+
+
+def bench_pipeline(args):
+    '''同じ操作の並びを、個別に呼び出した場合とpipelineでまとめた場合で比較する。
+
+    ※注意　M900、D200に書き込みを行います。
+    '''
+    m700 = M700.get_connection(args.host)
+
+    def sequence(m):
+        m.get_run_status()
+        m.write_dev('M900', 1)
+        m.write_dev('D200', 10)
+        m.read_dev('M900')
+        m.read_dev('D200')
+        m.write_dev('M900', 0)
+        m.write_dev('D200', 0)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        sequence(m700)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        with m700.pipeline() as p:
+            sequence(p)
+    pipelined = time.perf_counter() - start
+
+    m700.close()
+    print('individual: {:.2f}ms/seq'.format(single / args.repeat * 1000))
+    print('pipeline  : {:.2f}ms/seq ({:.2f}x)'.format(pipelined / args.repeat * 1000, single / pipelined))
+
+
+def bench_replay(args):
+    '''実機で記録したトレースを再生し、read_file、find_dir、デバイス読み出しの所要時間を計測する。'''
+    m700 = M700(args.host, backend=lambda: ReplayEZCom(args.trace, args.host, speed=args.speed))
+    ops = []
+    if args.read_file:
+        ops.append(('read_file', args.read_file))
+    if args.find_dir:
+        ops.append(('find_dir', args.find_dir))
+    if args.devs:
+        ops.append(('read_devs', args.devs))
+    m700.is_open()
+    for name, arg in ops:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            getattr(m700, name)(arg)
+        elapsed = time.perf_counter() - start
+        print('{:10s}: {:.2f}ms/call'.format(name, elapsed / args.repeat * 1000))
+    m700.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='M700関連の性能計測')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    p = sub.add_parser('collector', help='Collectorのスレッド方式とプロセス方式の比較')
+    p.add_argument('hosts', nargs='+', help='IPアドレス:ポート番号')
+    p.add_argument('--metrics', nargs='+', default=['get_rpm', 'get_load'])
+    p.add_argument('--interval', type=float, default=0.0, help='ポーリング周期[秒]。0なら最大速度')
+    p.add_argument('--seconds', type=float, default=10.0, help='各方式の計測時間[秒]')
+    p.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+    p.add_argument('--trace', help='M700.start_recordingで記録したトレースファイル。指定すると実機の代わりに再生する')
+    p.add_argument('--speed', type=float, default=1.0, help='トレースの再生速度の倍率。0なら待たない')
+    p.set_defaults(func=bench_collector)
+
+    p = sub.add_parser('import', help='import m700 にかかる時間の計測')
+    p.add_argument('--repeat', type=int, default=10, help='計測回数')
+    p.add_argument('--budget', type=float, default=20.0, help='中央値の予算[ミリ秒]')
+    p.set_defaults(func=bench_import)
+
+    p = sub.add_parser('pipeline', help='個別呼び出しとpipelineの比較')
+    p.add_argument('host', help='IPアドレス:ポート番号')
+    p.add_argument('--repeat', type=int, default=100, help='操作の並びを繰り返す回数')
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser('replay', help='記録したトレースの再生による計測')
+    p.add_argument('trace', help='M700.start_recordingで記録したトレースファイル')
+    p.add_argument('host', help='再生するホスト（IPアドレス:ポート番号）')
+    p.add_argument('--speed', type=float, default=1.0, help='再生速度の倍率。0なら待たない')
+    p.add_argument('--repeat', type=int, default=100, help='各操作の繰り返し回数')
+    p.add_argument('--read-file', help='read_fileで読み出すパス')
+    p.add_argument('--find-dir', help='find_dirで検索するパス')
+    p.add_argument('--devs', nargs='+', help='read_devsで読み出すデバイス')
+    p.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
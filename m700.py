@@ -3,28 +3,109 @@
 三菱電機CNC M700シリーズとEZSocketを使って通信する。
 通信対象はマシニングセンタ系三菱CNC M700/M700V/M70/M70V。
 '''
+import contextlib
 from enum import Enum
 import threading
-
-import pythoncom
-import win32com.client
-from win32com.client import VARIANT
+import time
+
+# pywin32はWindows環境でしか利用できないため、接続を開く時に初めて読み込む。
+# 列挙体やエラーコードの解読のみ利用する場合は、どのOSでもimportできる。
+# 同様に、pipelineでのみ利用するconcurrent.futures（loggingを読み込む）とinspectも利用時に読み込む。
+_pythoncom = None
+_win32com_client = None
+
+def _load_com():
+    '''pywin32のCOMモジュールを読み込む。2回目以降は読み込み済みのモジュールを返す。
+
+    Return:
+        tuple: (pythoncom, win32com.client)
+    '''
+    global _pythoncom, _win32com_client
+    if _pythoncom is None:
+        import pythoncom
+        import win32com.client
+        _pythoncom, _win32com_client = pythoncom, win32com.client
+    return _pythoncom, _win32com_client
+
+# エラーコード一覧は初めてエラーを解読する時にm700_errors.pyから読み込む
+_errmap = None
+
+def decode_error(errcd):
+    '''EZSocketのエラーコードからエラーの内容を返す。
+
+    Args:
+        errcd (int): エラーコード
+    Return:
+        tuple: (16進数エラーコード, エラーメッセージ) exp) ('0x80a00101', '通信回線がオープンされていません')
+    '''
+    global _errmap
+    if _errmap is None:
+        from m700_errors import ERRORS
+        _errmap = {int(line[:8], 16): line[9:] for line in ERRORS.splitlines()}
+    errcd &= 0xffffffff
+    return '0x' + format(errcd, 'x'), _errmap.get(errcd, 'Unkown error') # 辞書に無ければUnkown error
     
 
+def device_type(dev):
+    '''デバイス番号から、EZSocketに指定するデータ種別を返す。
+
+    Args:
+        dev (str): デバイス番号 exp) M900, D200
+    Return:
+        int: データ種別 M=1(ビット型 1bit), D=4(ワード型 16bit)
+    Raises:
+        Exception: M,Dデバイス以外、又は番号が数字でない場合
+    '''
+    if not isinstance(dev, str) or len(dev) < 2 or not dev[1:].isdigit():
+        raise Exception('デバイス番号が不正です: ' + str(dev))
+    if dev[0] == 'M':
+        return 1
+    elif dev[0] == 'D':
+        return 4
+    raise Exception('Mデバイス、又はDデバイスを設定して下さい。: ' + dev)
+
+
+class DeviceRequest():
+    '''検証済みのデバイスのリストと、Device_SetDeviceに渡す引数。M700.compile_devs()で作成する。'''
+
+    def __init__(self, devs):
+        self.devs = tuple(devs)
+        self.data_types = tuple(device_type(dev) for dev in self.devs)
+        self.__variants = None
+
+    def __len__(self):
+        return len(self.devs)
+
+    def __iter__(self):
+        return iter(self.devs)
+
+    def variants(self):
+        '''デバイス、データ種別、読み出し用のダミー値のVARIANTを返す。初回のみ作成する。'''
+        if self.__variants is None:
+            pythoncom, client = _load_com()
+            self.__variants = (
+                client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_BSTR, list(self.devs)),
+                client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I4, list(self.data_types)),
+                client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I4, [0] * len(self.devs)))
+        return self.__variants
+
+
 class M700():
 
     #同一スレッド内で同一ホストの接続は同じインスタンスを使う
     #同一スレッドなのは、COMオブジェクトを別スレッドで共有するのが複雑なため
     __connections = {}
     @classmethod
-    def get_connection(cls, host):
+    def get_connection(cls, host, backend=None):
         key = str(threading.current_thread().ident) + "_" + host
         if key not in cls.__connections:
-            cls.__connections[key] = M700(host)
+            cls.__connections[key] = M700(host, backend)
         return cls.__connections[key]
     
     #1-255の一意の値管理
+    #ロックは接続ごとなので、ユニット番号の管理は専用のロックで排他する
     __uno_list = [False]*255
+    __uno_lock = threading.Lock()
     @classmethod
     def alloc_unitno(cls):
         '''EZSocketで未使用のユニット番号を返す。
@@ -32,15 +113,17 @@ class M700():
         Returns:
             int: ユニット番号
         '''
-        for i,v in enumerate(cls.__uno_list):
-            if v == False:
-                cls.__uno_list[i] = True
-                return i+1
+        with cls.__uno_lock:
+            for i,v in enumerate(cls.__uno_list):
+                if v == False:
+                    cls.__uno_list[i] = True
+                    return i+1
         raise Exception("ユニット番号が255を超えました。同時接続数が多すぎます")
     
     @classmethod
     def release_unitno(cls, uno):
-        cls.__uno_list[uno-1] = False
+        with cls.__uno_lock:
+            cls.__uno_list[uno-1] = False
     
     # --- クラス内利用列挙体 ---
     
@@ -70,15 +153,20 @@ class M700():
     __port = None
     __isopen = False
     __ezcom = None
-    __lock = threading.RLock()
+    __backend = None
+    __trace = None
 
-    def __init__(self, host):
+    def __init__(self, host, backend=None):
         '''
         Args:
             host: IPアドレス:ポート番号
+            backend (callable): COMオブジェクトの代わりを生成する関数。Noneの場合はEZSocketのCOMオブジェクトを利用する。
+                                exp) lambda: m700_trace.ReplayEZCom('trace.jsonl', host)
         '''
-        pythoncom.CoInitialize() # 複数スレッドで実行する際は、COMオブジェクトの初期化が必要
         self.__ip, self.__port = host.split(':')
+        self.__backend = backend
+        # 接続ごとのロック。別ホストの接続はそれぞれのスレッドで並行に通信できる
+        self.__lock = threading.RLock()
 
     def __str__(self):
         return self.__ip + ":" + self.__port + " " + ("Open" if self.__isopen else "Close")
@@ -87,7 +175,15 @@ class M700():
         '''引数として与えられたIPとユニット番号に対してコネクションを開く。
         すでにオープン後に再度呼び出された場合は何もしない。'''
         if not self.__isopen:
-            self.__ezcom = win32com.client.Dispatch('EZNcAut.DispEZNcCommunication')
+            if self.__backend is None:
+                pythoncom, client = _load_com()
+                pythoncom.CoInitialize() # 複数スレッドで実行する際は、COMオブジェクトの初期化が必要
+                self.__ezcom = client.Dispatch('EZNcAut.DispEZNcCommunication')
+            else:
+                self.__ezcom = self.__backend()
+            if self.__trace is not None:
+                from m700_trace import TraceRecorder
+                self.__ezcom = TraceRecorder(self.__ezcom, self.__trace[0], self.__ip + ':' + self.__port)
             errcd = self.__ezcom.SetTCPIPProtocol(self.__ip, int(self.__port))
             self.__unitno = M700.alloc_unitno()
             self.__raise_error(errcd)
@@ -126,6 +222,73 @@ class M700():
                 pass
             return self.__isopen
 
+    def start_recording(self, trace):
+        '''以降の全てのCOM呼び出しをトレースに記録する。次に接続を開いた時から有効になる。
+        記録したトレースはm700_trace.ReplayEZComで再生できる。
+
+        Args:
+            trace (str or m700_trace.TraceWriter): トレースファイルのパス、又は複数の接続で共有するTraceWriter
+        '''
+        from m700_trace import TraceWriter
+        with self.__lock:
+            self.stop_recording()
+            if isinstance(trace, TraceWriter):
+                self.__trace = (trace, False)
+            else:
+                self.__trace = (TraceWriter(trace), True)
+            # 記録は接続を開いた時から始めるため、開いている場合は一旦閉じる
+            if self.__isopen:
+                self.close()
+
+    def stop_recording(self):
+        '''トレースへの記録を終了する。開いている接続は閉じる。'''
+        with self.__lock:
+            if self.__trace is None:
+                return
+            if self.__isopen:
+                self.close()
+            writer, owned = self.__trace
+            self.__trace = None
+            if owned:
+                writer.close()
+            else:
+                writer.flush()
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        '''複数の操作を溜めておき、withブロックを抜ける時に1回のロック取得でまとめて実行する。
+        実行中に他のスレッドの操作が割り込むことはない。
+        連続したread_dev(s)、write_dev(s)はそれぞれ1回の通信にまとめられる。
+
+        最初にエラーが発生した操作で中断し、その例外をwithブロックから送出する。
+        以降の操作は実行されず、Futureはキャンセルされる。
+        withブロック内で例外が発生した場合は、何も実行しない。
+
+        exp)
+            with m700.pipeline() as p:
+                status = p.get_run_status()
+                p.write_dev('M900', 1)
+                p.write_dev('D200', 10)
+                m900 = p.read_dev('M900')
+            status.result(), m900.result()
+
+        Yield:
+            Pipeline: 操作を溜めるオブジェクト。M700と同じメソッドを持ち、Futureを返す。
+        '''
+        p = Pipeline()
+        try:
+            yield p
+        except:
+            p.cancel()
+            raise
+        with self.__lock:
+            try:
+                self.__open()
+            except:
+                p.cancel()
+                raise
+            p.execute(self)
+
     # --- NC情報取得関連 ---
 
     def get_drive_infomation(self):
@@ -222,6 +385,50 @@ class M700():
             self.__raise_error(errcd)
             return data
 
+    def get_spindle_monitor(self, params, spindles=(1,), with_info=False, as_numpy=False):
+        '''複数の主軸の、複数のモニタ項目を1回のロック取得でまとめて取得する。
+
+        Args:
+            params (list): 主軸のパラメータ番号のリスト exp) [2, 3] 2=回転速度[rpm], 3=ロード[%]
+            spindles (list): 主軸番号のリスト exp) [1, 2]
+            with_info (bool): Trueなら主軸情報の文字列も返す
+            as_numpy (bool): Trueなら値をnumpy.ndarrayで返す（numpyが必要）
+        Return:
+            list: 値の2次元配列。data[パラメータの位置][主軸の位置]
+                  with_infoがTrueの場合は (data, info) を返す。infoはdataと同じ形の文字列の2次元配列。
+        '''
+        with self.__lock:
+            self.__open()
+            data = []
+            info = []
+            for param in params:
+                # in_1：指定した主軸のパラメータ番号を指定。
+                # in_2：主軸番号を指定。
+                # data：主軸の状態を返す。
+                # info：主軸情報をUNICODE文字列として取得。
+                row_data = []
+                row_info = []
+                for spindle in spindles:
+                    errcd, value, text = self.__ezcom.Monitor_GetSpindleMonitor(param, spindle)
+                    self.__raise_error(errcd)
+                    row_data.append(value)
+                    if with_info:
+                        row_info.append(self.__decode_spindle_info(text))
+                data.append(row_data)
+                info.append(row_info)
+
+        if as_numpy:
+            import numpy
+            data = numpy.array(data)
+        if with_info:
+            return data, info
+        return data
+
+    @staticmethod
+    def __decode_spindle_info(text):
+        '''主軸情報の文字列から、最初のNULL文字以降と前後の空白を除く。'''
+        return (text or '').split('\0', 1)[0].strip()
+
     def get_mgn_size(self):
         '''マガジンサイズ取得。
         
@@ -480,28 +687,30 @@ class M700():
                     
     # --- NCデバイス操作関連 ---
 
-    def __setting_dev(self, dev, data=0):
+    def __setting_dev(self, devs, data=None):
         '''デバイスの設定を行う。
 
         Args:
-            dev (str): デバイス指定。exp) M810, D10
-            data (int): 値。ビットを立てる場合は1、下げる場合は0。 
-                        read_devの場合は、ダミーとして適当な文字を入れる。
-        '''
-        data_type = 0 # 1 or 4 or 8 exp) M=1(ビット型 1bit), D=4(ワード型 16bit)
-        if dev[0] == 'M':
-            data_type = 1
-        elif dev[0] == 'D':
-            data_type = 4
-        else:
-            Exception('Mデバイス、又はDデバイスを設定して下さい。')
+            devs (list or DeviceRequest): デバイス指定のリスト。exp) ['M810', 'D10']
+                                          M700.compile_devs()で事前に作成したDeviceRequestも指定できる。
+            data (list): 値のリスト。ビットを立てる場合は1、下げる場合は0。 
+                         read_devの場合は省略する（ダミーとして0を設定）。
+        '''
+        if not isinstance(devs, DeviceRequest):
+            devs = DeviceRequest(devs)
         
-        # in_1：デバイス文字列（設定するデバイス文字列の配列をVARIANTとして指定）
+        # in_1：デバイス文字列（設定するデバイス文字列の配列をVARIANTとして指定）
         # in_2：データ種別
         # in_3：デバイス値配列
-        vDevice = VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_BSTR, [dev])
-        vDataType = VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I4, [data_type])
-        vValue = VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I4, [data]) # 書き込むデータは現在数値のみ
+        if self.__backend is None:
+            vDevice, vDataType, vValue = devs.variants()
+            if data is not None:
+                pythoncom, client = _load_com()
+                vValue = client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I4, list(data)) # 書き込むデータは現在数値のみ
+        else:
+            # COM以外のバックエンドにはリストのまま渡す
+            vDevice, vDataType = list(devs.devs), list(devs.data_types)
+            vValue = [0] * len(devs) if data is None else list(data)
         errcd = self.__ezcom.Device_SetDevice(vDevice, vDataType, vValue)
         self.__raise_error(errcd)
 
@@ -516,15 +725,39 @@ class M700():
         Args:
             dev (str): デバイス番号 exp) M900
         Return:
-            int: 読み出したデータの値を返す。
+            int: 読み出したデータの値を返す。
+        '''
+        return self.read_devs([dev])[0]
+
+    @staticmethod
+    def compile_devs(devs):
+        '''デバイスのリストを検証し、read_devs、write_devsに渡す引数を事前に作成する。
+        同じデバイスのリストを繰り返し読み書きする場合に、毎回の解析と引数の作成を省ける。
+
+        Args:
+            devs (list): デバイス番号のリスト exp) ['M900', 'D200']
+        Return:
+            DeviceRequest: read_devs、write_devsにリストの代わりに渡す。
+        Raises:
+            Exception: M,Dデバイス以外が指定された場合
+        '''
+        return DeviceRequest(devs)
+
+    def read_devs(self, devs):
+        '''複数デバイスを1回の通信でまとめて読み出す。
+        
+        Args:
+            devs (list or DeviceRequest): デバイス番号のリスト exp) ['M900', 'D200']
+        Return:
+            list: 読み出したデータの値をdevsと同じ順で返す。
         '''
         with self.__lock:
             self.__open()
-            self.__setting_dev(dev)
+            self.__setting_dev(devs)
             errcd, value = self.__ezcom.Device_Read() # value：デバイス値配列が返ってくる。
             self.__raise_error(errcd)
             self.__delall_dev()
-            return value[0]
+            return list(value)
 
     def write_dev(self, dev, data):
         '''デバイス書き込み。__setting_devで設定したデバイスに値を書き込む。
@@ -533,299 +766,198 @@ class M700():
             dev (str): デバイス番号 exp) M900
             data (int): 書き込む値
         '''
+        self.write_devs([dev], [data])
+
+    def write_devs(self, devs, data):
+        '''複数デバイスに1回の通信でまとめて書き込む。
+        
+        Args:
+            devs (list or DeviceRequest): デバイス番号のリスト exp) ['M900', 'D200']
+            data (list): 書き込む値のリスト。devsと同じ順で指定する。
+        '''
+        if len(devs) != len(data):
+            raise Exception('デバイスと書き込む値の数が一致しません。')
         with self.__lock:
             self.__open()
-            self.__setting_dev(dev, data)
+            self.__setting_dev(devs, data)
             errcd = self.__ezcom.Device_Write()
             self.__delall_dev()
             self.__raise_error(errcd)
 
+    def watch_devs(self, devs, on_change, interval=0.1, idle_interval=None, stop_event=None, on_lag=None):
+        '''デバイスを監視し、値が変化した（エッジ）時だけコールバックを呼び出す。
+        stop_eventがセットされるまで、呼び出し元のスレッドでブロックする。
+
+        devsは毎回1回の通信でまとめて読み出し、前回値との比較で変化したデバイスを検出する。
+        intervalでポーリングする。idle_intervalを指定した場合は、変化が無い間はidle_intervalまで
+        徐々に周期を延ばす（通信回数は減るが、延ばした周期より短いパルスは取りこぼす恐れがある）。
+
+        Args:
+            devs (list): 監視するデバイス番号のリスト exp) ['M900', 'M901', 'D200']
+            on_change (callable): on_change(dev, old, new) の形で変化したデバイスごとに呼ばれる。
+            interval (float): 要求するポーリング周期[秒]
+            idle_interval (float): 変化が無い間に延ばす周期の上限[秒]。Noneの場合はintervalのまま延ばさない
+            stop_event (threading.Event): セットされると監視を終了する。Noneの場合は終了しない
+            on_lag (callable): on_lag(achieved, requested) の形で、実際の周期[秒]がその時点の周期を
+                               1.5倍以上超えた（通信やスレッドの遅延でエッジを取りこぼす恐れがある）場合に呼ばれる。
+                               requestedは引数のintervalではなく、延ばした後の周期（interval~idle_interval）。
+                               変化が無い間に周期を延ばすのは意図した動作のため、遅延としては扱わない。
+        Return:
+            dict: 監視の統計 exp) { 'polls': 100, 'edges': 3, 'lags': 0 }
+        '''
+        if idle_interval is None:
+            idle_interval = interval
+        if stop_event is None:
+            stop_event = threading.Event()
+        stats = {'polls': 0, 'edges': 0, 'lags': 0}
+
+        request = DeviceRequest(devs)
+        prev = self.read_devs(request)
+        period = interval
+        last = time.monotonic()
+        while not stop_event.wait(max(0, period - (time.monotonic() - last))):
+            now = time.monotonic()
+            achieved, requested = now - last, period
+            last = now
+            cur = self.read_devs(request)
+            stats['polls'] += 1
+
+            # 実際の周期がその時点の周期の1.5倍を超えたらエッジ取りこぼしの恐れあり
+            # （intervalと比較すると、周期を延ばしている間は常に遅延と判定されてしまう）
+            if achieved > requested * 1.5:
+                stats['lags'] += 1
+                if on_lag is not None:
+                    on_lag(achieved, requested)
+
+            # リスト同士の比較で変化の有無を一括判定し、変化がある時だけ個別に比較する
+            if cur == prev:
+                period = min(period * 1.5, idle_interval)
+                continue
+            period = interval
+            for dev, old, new in zip(request.devs, prev, cur):
+                if old != new:
+                    stats['edges'] += 1
+                    on_change(dev, old, new)
+            prev = cur
+        return stats
+
     # --- エラー出力関連 ---
 
     def __raise_error(self, errcd):
         '''エラーコードから、エラーの内容をExceptionとして返す。
 
         エラーがない場合（エラーコードが0）は何もしない。
-        エラーの内容は、辞書で {'16進数エラーコード': 'error detail message'} の形で登録。
+        エラーの内容は、m700_errors.pyに登録。
 
         Raises:
             Exception: エラーメッセージ
         '''
-        __errmap = {
-            "0x80a00101" : "通信回線がオープンされていません",
-            "0x80a00104" : "2重オープンエラー",
-            "0x80a00105" : "引数のデータタイプが不正",
-            "0x80a00106" : "引数のデータ範囲が不正",
-            "0x80a00107" : "サポートしていない",
-            "0x80a00109" : "通信回線がオープンできません",
-            "0x80a0010a" : "引数がnullポインタです。",
-            "0x80a0010b" : "引数のデータ不正",
-            "0x80a0010c" : "COMMポートハンドルエラー",
-            "0x80b00101" : "メモリの確保ができない",
-            "0x80b00102" : "EZSocketPcのエラーが取得できない",
-            "0x80b00201" : "モード指定不正",
-            "0x80b00202" : "未ファイルオープン",
-            "0x80b00203" : "ファイルが既に存在する",
-            "0x80b00204" : "既にファイルオープンしている",
-            "0x80b00205" : "テンポラリファイルを作成できない",
-            "0x80b00206" : "書き込みモード指定でファイルオープンしていない",
-            "0x80b00207" : "書き込みデータサイズ不正",
-            "0x80b00208" : "書き込みできない状態",
-            "0x80b00209" : "読み出しモード指定でファイルオープンしていない",
-            "0x80b0020a" : "読み出しできない状態",
-            "0x80b0020b" : "テンポラリファイルを作成できない",
-            "0x80b0020c" : "ファイルが存在しない（readモード）",
-            "0x80b0020d" : "ファイルがオープンできない",
-            "0x80b0020e" : "ファイルのパスが不正",
-            "0x80b0020f" : "読み出しファイルが不正",
-            "0x80b00210" : "書き込みファイルが不正",
-            "0x80b00301" : "オートメーション呼び出しでローカル接続時のホスト名が不正",
-            "0x80b00302" : "TCP/IP通信が設定されていない",
-            "0x80b00303" : "既に通信中なので設定できない",
-            "0x80b00304" : "下位モジュールがない",
-            "0x80b00305" : "EZSocketPcオブジェクトが生成できない",
-            "0x80b00401" : "データが存在しない",
-            "0x80b00402" : "データ重複",
-            "0x80b00501" : "パラメータ情報ファイルがない",
-            "0x80020190" : "NCカード番号不正",
-            "0x80020102" : "デバイスがオープンされていない",
-            "0x80020132" : "コマンド不正",
-            "0x80020133" : "通信パラメータデータ範囲不正",
-            "0x80030143" : "ファイルシステムに異常がある",
-            "0x80030191" : "ディレクトリが存在しない",
-            "0x8003019b" : "ドライブが存在しない",
-            "0x800301a2" : "ディレクトリが存在しない",
-            "0x800301a8" : "ドライブが存在しない",
-            "0x80050d90" : "系統、軸指定が不正",
-            "0x80050d02" : "アラーム種類が不正",
-            "0x80050d03" : "NCとPC間の通信データにエラーがある",
-            "0x80041194" : "寿命管理データの種類指定不正",
-            "0x80041195" : "設定データ範囲オーバ",
-            "0x80041196" : "設定工具番号不一致",
-            "0x80041197" : "指定工具番号が仕様外",
-            "0x80040190" : "系統、軸指定が不正",
-            "0x80040191" : "大区分番号不正",
-            "0x80040192" : "小区分番号不正",
-            "0x80040196" : "アプリケーションが用意したバッファに入りきらない",
-            "0x80040197" : "データタイプ不正",
-            "0x8004019d" : "データが読み出せない状態にある",
-            "0x8004019f" : "書き込み専用データ",
-            "0x800401a0" : "軸指定不正",
-            "0x800401a1" : "データ番号不正",
-            "0x800401a3" : "読み出しデータなし",
-            "0x8004019a" : "読み出しデータ範囲不正",
-            "0x80040290" : "系統、軸指定が不正",
-            "0x80040291" : "大区分番号不正",
-            "0x80040292" : "小区分番号不正",
-            "0x80040296" : "アプリケーションが用意したバッファに入りきらない",
-            "0x80040297" : "データタイプ不正",
-            "0x8004029b" : "読み出し専用データ",
-            "0x8004029e" : "データが書き込めない状態にある",
-            "0x800402a0" : "軸指定不正",
-            "0x8004024d" : "安全パスワードロック中",
-            "0x800402a2" : "SRAM開放パラメータ不正によりフォーマット中止した",
-            "0x800402a4" : "編集ァイルを登録できない(既に編集中)",
-            "0x800402a5" : "編集ファイルを解除できない",
-            "0x800402a3" : "書き込み先データなし",
-            "0x8004029a" : "書き込みデータ範囲不正",
-            "0x800402a6" : "安全パスワード未設定",
-            "0x800402a7" : "安全データ整合性チェックエラー",
-            "0x800402a9" : "安全用データタイプ不",
-            "0x800402a8" : "工具データソート中で書き込みできない",
-            "0x80040501" : "高速読み出し登録されていない",
-            "0x80040402" : "プライオリティ指定不正",
-            "0x80040401" : "登録数をオーバした",
-            "0x80040490" : "アドレス不正",
-            "0x80040491" : "大区分番号不正",
-            "0x80040492" : "小区分番号不正",
-            "0x80040497" : "データタイプ不正",
-            "0x8004049b" : "読み出し専用データ",
-            "0x8004049d" : "データが読み出せない状態にある",
-            "0x8004049f" : "書き込み専用データ",
-            "0x800404a0" : "軸指定不正",
-            "0x80040ba3" : "再ねじ切り位置設定なし",
-            "0x80030101" : "既に別ディレクトリがオープンされている",
-            "0x80030103" : "データサイズオーバ",
-            "0x80030148" : "ファイル名が長い",
-            "0x80030198" : "ファイル名フォーマットが不正",
-            "0x80030190" : "オープンされていない",
-            "0x80030194" : "ファイル情報リードエラー",
-            "0x80030102" : "すでに別ディレクトリがオープンされている(PCのみ)",
-            "0x800301a0" : "オープンされていない",
-            "0x800301a1" : "ファイルが存在しない",
-            "0x800301a5" : "ファイル情報リードエラー",
-            "0x80030447" : "コピーできない状態にある(運転中)",
-            "0x80030403" : "登録本数オーバ",
-            "0x80030401" : "コピー先ファイルが既に存在する",
-            "0x80030443" : "ファイルシステムに異常がある",
-            "0x80030448" : "ファイル名が長い",
-            "0x80030498" : "ファイル名フォーマットが不正",
-            "0x80030404" : "メモリ容量オーバ",
-            "0x80030491" : "ディレクトリが存在しない",
-            "0x8003049b" : "ドライブが存在しない",
-            "0x80030442" : "ファイルが存在しない",
-            "0x80030446" : "コピーできない状態にある(PLC動作中)",
-            "0x80030494" : "転送元ファイルが読めない",
-            "0x80030495" : "転送先ファイルに書き込めない",
-            "0x8003044a" : "コピーできない状態にある(プロテクト中)",
-            "0x80030405" : "照合エラー",
-            "0x80030449" : "照合機能をサポートしていない",
-            "0x8003044c" : "ファイルコピー中",
-            "0x80030490" : "ファイルがオープンされていない",
-            "0x8003044d" : "安全パスワードロック中",
-            "0x8003049d" : "ファイルフォーマット不正",
-            "0x8003049e" : "パスワードが異なる",
-            "0x800304a4" : "ファイルが生成できない(PCのみ)",
-            "0x800304a3" : "ファイルをオープンできない(PCのみ)",
-            "0x80030402" : "コピー先ファイルが既に存在する",
-            "0x800304a7" : "ファイル名フォーマットが不正",
-            "0x800304a2" : "ディレクトリが存在しない",
-            "0x800304a8" : "ドライブが存在しない",
-            "0x800304a1" : "ファイルが存在しない",
-            "0x800304a5" : "転送元ファイルが読めない",
-            "0x800304a6" : "転送先ファイルに書き込めない",
-            "0x80030406" : "ディスク容量オーバ",
-            "0x800304a0" : "ファイルがオープンされていない",
-            "0x80030201" : "削除できないファイル",
-            "0x80030242" : "ファイルが存在しない",
-            "0x80030243" : "ファイルシステムに異常がある",
-            "0x80030247" : "削除できない状態にある(運転中)",
-            "0x80030248" : "ファイル名が長い",
-            "0x8003024a" : "ファイルが削除できない状態にある(プロテクト中)",
-            "0x80030291" : "ディレクトリが存在しない",
-            "0x80030298" : "ファイル名フォーマットが不正",
-            "0x8003029b" : "ドライブが存在しない",
-            "0x80030202" : "削除できないファイル",
-            "0x800302a7" : "ファイル名フォーマットが不正",
-            "0x800302a2" : "ディレクトリが存在しない",
-            "0x800302a8" : "ドライブが存在しない",
-            "0x800302a1" : "ファイルが存在しない",
-            "0x80030301" : "新ファイル名が既に存在する",
-            "0x80030342" : "ファイルが存在しない",
-            "0x80030343" : "ファイルシステムに異常がある",
-            "0x80030347" : "リネームできない状態にある(運転中)",
-            "0x80030348" : "ファイル名が長い",
-            "0x8003034a" : "リネームできない状態にある(プロテクト中)",
-            "0x80030391" : "ディレクトリが存在しない",
-            "0x80030398" : "ファイル名フォーマットが不正",
-            "0x8003039b" : "ドライブが存在しない",
-            "0x80030303" : "リネームできない",
-            "0x80030305" : "新旧ファイル名が同じ",
-            "0x80030302" : "新ファイル名が既に存在する",
-            "0x800303a7" : "ファイル名フォーマットが不正",
-            "0x800303a2" : "ディレクトリが存在しない",
-            "0x800303a8" : "ドライブが存在しない",
-            "0x800303a1" : "ファイルが存在しない",
-            "0x80030691" : "ディレクトリが存在しない",
-            "0x8003069b" : "ドライブが存在しない",
-            "0x80030643" : "ファイルシステムに異常がある",
-            "0x80030648" : "ファイル名が長いまたはフォーマットが不正",
-            "0x800306a2" : "ディレクトリが存在しない(PCのみ)",
-            "0x800306a8" : "ドライブが存在しない(PCのみ)",
-            "0x80030701" : "アプリケーションが用意したバッファに入りきらない",
-            "0x80030794" : "ドライブ情報リードエラー",
-            "0x82020001" : "すでにオープンされている",
-            "0x82020002" : "オープンされていない",
-            "0x82020004" : "カードが存在しない",
-            "0x82020006" : "チャンネル番号不正",
-            "0x82020007" : "ファイルディスクプリタ不正",
-            "0x8202000a" : "コネクトされていない",
-            "0x8202000b" : "クローズされていない",
-            "0x82020014" : "タイムアウト",
-            "0x82020015" : "データ不正",
-            "0x82020016" : "キャンセル要求により終了した",
-            "0x82020017" : "パケットサイズ不正",
-            "0x82020018" : "タスク終了により終了した",
-            "0x82020032" : "コマンド不正",
-            "0x82020033" : "設定データ不正",
-            "0x80060001" : "データリードキャッシュが無効",
-            "0x80060090" : "アドレス不正",
-            "0x80060091" : "大区分番号不正",
-            "0x80060092" : "小区分番号不正",
-            "0x80060097" : "データタイプ不正",
-            "0x8006009a" : "データ範囲不正",
-            "0x8006009d" : "データが読み出せない状態にある",
-            "0x8006009f" : "データタイプ不正",
-            "0x800600a0" : "軸指定不正",
-            "0x80070140" : "作業領域を確保できない",
-            "0x80070142" : "ファイルをオープンできない",
-            "0x80070147" : "ファイルがオープンできない状態にある(運転中)",
-            "0x80070148" : "ファイルパスが長い",
-            "0x80070149" : "未サポート(CF未対応)",
-            "0x80070192" : "すでにオープンされている",
-            "0x80070199" : "最大ファイルオープン数を越えた",
-            "0x8007019f" : "工具データソート中でオープンができない",
-            "0x800701b0" : "安全パスワードが未認証",
-            "0x80070290" : "ファイルがオープンされていない",
-            "0x80070340" : "作業領域を確保できない",
-            "0x80070347" : "ファイルが生成できない状態にある(運転中)",
-            "0x80070348" : "ファイルパスが長い",
-            "0x80070349" : "未サポート(CF未対応)",
-            "0x80070392" : "すでに生成されている",
-            "0x80070393" : "ファイルを生成できない",
-            "0x80070399" : "最大ファイルオープン数を越えた",
-            "0x8007039b" : "ドライブが存在しない",
-            "0x80070490" : "ファイルがオープンされていない",
-            "0x80070494" : "ファイル情報リードエラー",
-            "0x80070549" : "書き込み不可",
-            "0x80070590" : "ファイルがオープンされていない",
-            "0x80070595" : "ファイル書き込みエラー",
-            "0x80070740" : "ファイル削除エラー",
-            "0x80070742" : "ファイルが存在しない3-6",
-            "0x80070747" : "ファイルが削除できない状態にある(運転中)",
-            "0x80070748" : "ファイルパスが長い",
-            "0x80070749" : "未サポート(CF未対応)",
-            "0x80070792" : "ファイルがオープンされている",
-            "0x8007079b" : "ドライブが存在しない",
-            "0x80070842" : "ファイルが存在しない",
-            "0x80070843" : "リネームできないファイル",
-            "0x80070848" : "ファイルパスが長い",
-            "0x80070849" : "未サポート(CF未対応)",
-            "0x80070892" : "ファイルがオープンされている",
-            "0x80070899" : "最大ファイルオープン数を越えた",
-            "0x8007089b" : "ドライブが存在しない",
-            "0x80070944" : "コマンド不正(未対応)",
-            "0x80070990" : "オープンされていない",
-            "0x80070994" : "リードエラー",
-            "0x80070995" : "ライトエラー",
-            "0x80070996" : "アプリケーションが用意したバッファに入りきらない",
-            "0x80070997" : "データタイプ不正",
-            "0x80070949" : "未サポート(CF未対応)",
-            "0x80070a40" : "作業領域を確保できない",
-            "0x80070a47" : "ディレクトリがオープンできない状態にある(運転中)",
-            "0x80070a48" : "ファイルパスが長い",
-            "0x80070a49" : "未サポート(CF未対応)",
-            "0x80070a91" : "ディレクトリが存在しない",
-            "0x80070a92" : "すでにオープンされている",
-            "0x80070a99" : "最大ディレクトリオープン数を越えた",
-            "0x80070a9b" : "ドライブが存在しない",
-            "0x80070b90" : "ディレクトリがオープンされていない",
-            "0x80070b91" : "ディレクトリが存在しない",
-            "0x80070b96" : "アプリケーションが用意したバッファに入りきらない",
-            "0x80070d90" : "ディレクトリがオープンされていない",
-            "0x80070e48" : "ファイルパスが長い",
-            "0x80070e49" : "サポート(CF未対応)",
-            "0x80070e94" : "ファイル情報読み込みエラー",
-            "0x80070e99" : "最大ファイルオープン数を越えた",
-            "0x80070e9b" : "ドライブが存在しない",
-            "0x80070f48" : "ファイルパスが長い",
-            "0x80070f49" : "未サポート(CF未対応)",
-            "0x80070f94" : "ファイル情報読み込みエラー",
-            "0x80070f90" : "ファイルがオープンされていないた",
-            "0x80070f9b" : "ドライブが存在しない",
-            "0x8007099c" : "SRAM開放パラ不正でフォーマット中止",
-            "0xf00000ff" : "引数が不正",
-            "0xffffffff" : "データが読み出せない/書き込めない状態"
-        }
-
         # 0: エラーなし, 1以上: File_FindDir2時にファイル情報ありの時
         if errcd == 0 or errcd >= 1: 
             return
         
-        hex_str = '0x' + format(errcd & 0xffffffff, 'x')
-        msg = __errmap.get(hex_str, 'Unkown error') # 辞書に無ければUnkown error
+        hex_str, msg = decode_error(errcd)
 
         # '通信回線がオープンされてない'or'コネクトされていない'ならclose扱い
         if '0x80a00101' == hex_str or '0x8202000a' == hex_str:
             self.close()
         raise Exception('Error=(IP:' + self.__ip + ') ' + hex_str + ': ' + msg)
+
+
+class Pipeline():
+    '''M700への操作を溜めておき、まとめて実行する。M700.pipeline()から利用する。'''
+
+    # まとめて実行できないメソッド
+    __excludes = ('close', 'is_open', 'pipeline', 'watch_devs', 'get_connection', 'alloc_unitno', 'release_unitno',
+                  'compile_devs', 'start_recording', 'stop_recording')
+
+    # 連続した場合に1回の通信にまとめるメソッドと、まとめた後のメソッド
+    __batches = {'read_dev': 'read_devs', 'read_devs': 'read_devs', 'write_dev': 'write_devs', 'write_devs': 'write_devs'}
+
+    def __init__(self):
+        self.__ops = [] # (メソッド名, 引数, キーワード引数, Future)
+
+    def __getattr__(self, name):
+        import inspect
+        from concurrent.futures import Future
+        method = getattr(M700, name, None)
+        if name.startswith('_') or name in Pipeline.__excludes or not inspect.isfunction(method):
+            raise AttributeError(name)
+        signature = inspect.signature(method)
+        def queue(*args, **kwargs):
+            # 引数の誤りは実行時ではなく、溜める時点でエラーにする
+            arguments = signature.bind(None, *args, **kwargs).arguments
+            if name == 'write_devs' and len(arguments['devs']) != len(arguments['data']):
+                raise Exception('デバイスと書き込む値の数が一致しません。')
+            future = Future()
+            self.__ops.append((name, args, kwargs, future))
+            return future
+        return queue
+
+    def results(self):
+        '''実行結果を操作した順に返す。エラーやキャンセルの場合は例外を送出する。'''
+        return [future.result() for _, _, _, future in self.__ops]
+
+    def cancel(self):
+        '''未実行の操作を全てキャンセルする。'''
+        for _, _, _, future in self.__ops:
+            future.cancel()
+
+    def __groups(self):
+        '''操作を実行単位にまとめる。連続したデバイスの読み出し、書き込みは1つにまとめる。
+
+        Yield:
+            tuple: (メソッド名, 引数, キーワード引数, [(Future, 結果の開始位置, 結果の個数 or None), ...])
+                   結果の個数がNoneの場合、Futureの結果はまとめた結果の1要素、それ以外はリスト。
+        '''
+        group = None
+        for name, args, kwargs, future in self.__ops:
+            # キーワード引数で指定されたデバイス操作はまとめずにそのまま実行する
+            batch = None if kwargs else Pipeline.__batches.get(name)
+            if batch is None:
+                if group is not None:
+                    yield group
+                    group = None
+                yield name, args, kwargs, [(future, 0, None)]
+                continue
+
+            if name.endswith('s'):
+                devs, data = list(args[0]), (list(args[1]) if len(args) > 1 else [])
+                count = len(devs)
+            else:
+                devs, data = [args[0]], list(args[1:])
+                count = None
+            # 同じデバイスへの書き込みが重なる場合は、順序を守るため別の通信にする
+            if group is not None and (group[0] != batch or (batch == 'write_devs' and set(devs) & set(group[1][0]))):
+                yield group
+                group = None
+            if group is None:
+                group = (batch, ([], []) if batch == 'write_devs' else ([],), {}, [])
+            group[3].append((future, len(group[1][0]), count))
+            group[1][0].extend(devs)
+            if batch == 'write_devs':
+                group[1][1].extend(data)
+        if group is not None:
+            yield group
+
+    def execute(self, m700):
+        '''溜めた操作を順に実行する。通常はM700.pipeline()のwithブロックを抜ける時に呼ばれる。
+
+        Raises:
+            Exception: 最初にエラーが発生した操作の例外
+        '''
+        for name, args, kwargs, targets in self.__groups():
+            try:
+                result = getattr(m700, name)(*args, **kwargs)
+            except Exception as e:
+                for future, _, _ in targets:
+                    future.set_exception(e)
+                self.cancel()
+                raise
+            for future, start, count in targets:
+                if kwargs or name not in ('read_devs', 'write_devs'):
+                    future.set_result(result)
+                elif name == 'write_devs':
+                    future.set_result(None)
+                else:
+                    future.set_result(result[start] if count is None else result[start:start + count])
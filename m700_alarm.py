@@ -0,0 +1,184 @@
+# coding: utf-8
+'''
+アラームの発生・解除の履歴を記録する。
+
+get_alerm()が返すアラーム文字列を毎回そのまま保存すると、同じ内容が繰り返し記録されるため、
+前回との差分から発生(raise)と解除(clear)のイベントだけを取り出し、
+文字列を辞書で番号に置き換えた固定長レコードとして追記する。
+'''
+import os
+import struct
+import sys
+import threading
+import time
+
+
+def split_alarms(msg):
+    '''get_alerm()が返す文字列を、1行1アラームのリストに分割する。空行は除く。'''
+    return [line.strip() for line in msg.splitlines() if line.strip()]
+
+
+class AlarmLog():
+    '''アラームのイベントを記録する追記専用のログ。
+
+    以下の2つのファイルで構成する。
+        path + '.log' : 固定長レコード [時刻(double), ホスト番号(uint32), メッセージ番号(uint32), 種別(uint8)]
+        path + '.dict': 文字列辞書。1行に「番号<TAB>文字列」
+    レコードは時刻順に追記されるため、期間の検索は二分探索で開始位置を求め、期間内のレコードだけを読み出す。
+    '''
+
+    RAISE = 1
+    CLEAR = 0
+
+    __record = struct.Struct('<dIIB3x')
+
+    def __init__(self, path):
+        '''
+        Args:
+            path (str): ログファイルのパス（拡張子無し）。既に存在する場合は追記する。
+        '''
+        self.__lock = threading.Lock()
+        self.__ids = {}
+        self.__strings = []
+        if os.path.exists(path + '.dict'):
+            # 書き込み中に終了した場合の改行で終わらない最終行を捨てる（番号は行の位置で決まるため）
+            with open(path + '.dict', 'rb+') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+            with open(path + '.dict', encoding='utf-8') as f:
+                for line in f:
+                    _, text = line.rstrip('\n').split('\t', 1)
+                    self.__ids[text] = len(self.__strings)
+                    self.__strings.append(text)
+        self.__dict = open(path + '.dict', 'a', encoding='utf-8')
+        self.__log = open(path + '.log', 'ab')
+        self.__reader = open(path + '.log', 'rb')
+        self.__count = os.path.getsize(path + '.log') // self.__record.size
+        # 書き込み中に終了した場合の途中までのレコードを捨て、追記位置をレコードの境界に揃える
+        self.__log.truncate(self.__count * self.__record.size)
+        self.__last = self.__read(self.__count - 1)[0] if self.__count else 0.0
+
+    def close(self):
+        with self.__lock:
+            self.__dict.close()
+            self.__log.close()
+            self.__reader.close()
+
+    def __intern(self, text):
+        '''文字列を番号に変換する。初出の文字列は辞書に追記する。'''
+        if text not in self.__ids:
+            self.__ids[text] = len(self.__strings)
+            self.__strings.append(text)
+            self.__dict.write('{}\t{}\n'.format(self.__ids[text], text))
+            self.__dict.flush()
+        return self.__ids[text]
+
+    def __read(self, i):
+        self.__reader.seek(i * self.__record.size)
+        return self.__record.unpack(self.__reader.read(self.__record.size))
+
+    def append(self, timestamp, host, kind, message):
+        '''イベントを1件追記する。時刻が前回より前の場合は前回の時刻に揃える（時刻順を保つため）。
+
+        Args:
+            timestamp (float): time.time()の時刻
+            host (str): IPアドレス:ポート番号
+            kind (int): AlarmLog.RAISE or AlarmLog.CLEAR
+            message (str): アラームメッセージ
+        '''
+        with self.__lock:
+            timestamp = max(timestamp, self.__last)
+            self.__log.write(self.__record.pack(timestamp, self.__intern(host), self.__intern(message), kind))
+            self.__log.flush()
+            self.__last = timestamp
+            self.__count += 1
+
+    def query(self, host, start, end):
+        '''ホストの指定期間のイベントを返す。
+
+        Args:
+            host (str): IPアドレス:ポート番号
+            start (float): 期間の開始時刻（含む）
+            end (float): 期間の終了時刻（含む）
+        Return:
+            list: exp) [(1500000000.0, AlarmLog.RAISE, 'アラームメッセージ'), ...]
+        '''
+        with self.__lock:
+            host_id = self.__ids.get(host)
+            if host_id is None:
+                return []
+            # 開始時刻以降の最初のレコードを二分探索
+            lo, hi = 0, self.__count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.__read(mid)[0] < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            result = []
+            self.__reader.seek(lo * self.__record.size)
+            for _ in range(lo, self.__count):
+                timestamp, h, msg, kind = self.__record.unpack(self.__reader.read(self.__record.size))
+                if timestamp > end:
+                    break
+                if h == host_id:
+                    result.append((timestamp, kind, self.__strings[msg]))
+            return result
+
+
+class AlarmTracker():
+    '''1台のNCのアラームを監視し、発生・解除のイベントを取り出す。'''
+
+    def __init__(self, m700, host, log=None):
+        '''
+        Args:
+            m700 (M700): 監視する接続。poll()は接続を取得したスレッドで呼び出すこと
+            host (str): IPアドレス:ポート番号。ログとイベントの識別に利用する
+            log (AlarmLog): イベントを記録するログ。Noneの場合は記録しない
+        '''
+        self.__m700 = m700
+        self.__host = host
+        self.__log = log
+        self.__raw = ''
+        self.__active = set()
+        self.__counts = {}
+
+    def active(self):
+        '''現在発生中のアラームを返す。'''
+        return set(self.__active)
+
+    def counts(self):
+        '''このトラッカーで検出したアラームごとの発生回数を返す。
+
+        Return:
+            dict: exp) {'アラームメッセージ': 3, ...}
+        '''
+        return dict(self.__counts)
+
+    def poll(self):
+        '''アラームを取得し、前回からの発生・解除をイベントとして返す。
+        取得した文字列が前回と同じ場合は、分割や比較を行わない。
+
+        Return:
+            list: exp) [(1500000000.0, '192.168.1.10:683', AlarmLog.RAISE, 'アラームメッセージ'), ...]
+        '''
+        raw = self.__m700.get_alerm()
+        if raw == self.__raw:
+            return []
+        timestamp = time.time()
+        self.__raw = raw
+        # 同じ文字列は同じオブジェクトを使い回す
+        current = set(map(sys.intern, split_alarms(raw)))
+
+        events = []
+        for msg in sorted(current - self.__active):
+            events.append((timestamp, self.__host, AlarmLog.RAISE, msg))
+            self.__counts[msg] = self.__counts.get(msg, 0) + 1
+        for msg in sorted(self.__active - current):
+            events.append((timestamp, self.__host, AlarmLog.CLEAR, msg))
+        self.__active = current
+
+        if self.__log is not None:
+            for event in events:
+                self.__log.append(*event)
+        return events
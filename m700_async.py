@@ -0,0 +1,187 @@
+# coding: utf-8
+'''
+M700をasyncioから利用するためのラッパー。
+
+EZSocketのCOM呼び出しは同期処理であり、Dispatchを生成したスレッド（アパートメント）で
+呼び出す必要があるため、ホストごとに専用のワーカースレッドを1本持ち、
+全てのCOM呼び出しをそのスレッド上で実行する。
+'''
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from m700 import M700
+
+
+class AsyncM700():
+
+    #ホストごとに専用のワーカースレッドを1本だけ持つ
+    #同一ホストのAsyncM700インスタンスは同じワーカースレッド（＝同じM700接続）を共有し、
+    #利用しているインスタンスが全てcloseされた時にワーカースレッドを終了する
+    __executors = {} # ホスト: [ThreadPoolExecutor, 参照数]
+    __executors_lock = threading.Lock()
+
+    @classmethod
+    def __acquire_executor(cls, host):
+        with cls.__executors_lock:
+            if host not in cls.__executors:
+                cls.__executors[host] = [ThreadPoolExecutor(max_workers=1, thread_name_prefix='m700_' + host), 0]
+            cls.__executors[host][1] += 1
+            return cls.__executors[host][0]
+
+    @classmethod
+    def __release_executor(cls, host):
+        '''参照数を減らし、最後の参照であればTrueを返す。'''
+        with cls.__executors_lock:
+            cls.__executors[host][1] -= 1
+            if cls.__executors[host][1] > 0:
+                return False
+            del cls.__executors[host]
+            return True
+
+    @classmethod
+    async def gather(cls, *aws, return_exceptions=False):
+        '''複数ホストへの要求をまとめて待つ。
+
+        ホストごとのワーカースレッドで並行に実行されるため、
+        イベントループは各要求の完了通知を待つだけでブロックされない。
+
+        Args:
+            aws: AsyncM700のメソッドが返すコルーチン
+            return_exceptions (bool): Trueなら例外も結果として返す（asyncio.gatherと同じ）
+        Return:
+            list: 引数の順に並んだ結果
+        '''
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    def __init__(self, host, timeout=None):
+        '''
+        Args:
+            host: IPアドレス:ポート番号
+            timeout (float): 各呼び出しのデフォルトタイムアウト秒数。Noneなら無制限
+        '''
+        self.__host = host
+        self.__timeout = timeout
+        self.__executor = AsyncM700.__acquire_executor(host)
+        self.__closed = False
+
+    def __str__(self):
+        return 'Async ' + self.__host
+
+    def __run(self, name, *args):
+        '''ワーカースレッド上で実行される。スレッドごとの接続を取得してメソッドを呼び出す。'''
+        m700 = M700.get_connection(self.__host)
+        return getattr(m700, name)(*args)
+
+    async def __call(self, name, *args, timeout=None):
+        '''M700のメソッドをワーカースレッドで実行し、結果を待つ。
+
+        タイムアウトやキャンセルが発生した場合、実行待ちの呼び出しは取り消される。
+        既に実行中のCOM呼び出しは中断できないため、完了まで続いた後に結果が破棄される。
+
+        Raises:
+            asyncio.TimeoutError: タイムアウトした場合
+            asyncio.CancelledError: キャンセルされた場合
+        '''
+        if timeout is None:
+            timeout = self.__timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.__executor, self.__run, name, *args)
+        return await asyncio.wait_for(future, timeout)
+
+    async def close(self):
+        '''このインスタンスの利用を終了する。
+        同一ホストの他のインスタンスが全てcloseされていれば、接続を閉じてワーカースレッドを終了する。
+        '''
+        if self.__closed:
+            return
+        self.__closed = True
+        if not AsyncM700.__release_executor(self.__host):
+            return
+        try:
+            await self.__call('close')
+        finally:
+            self.__executor.shutdown(wait=False)
+
+    async def is_open(self, timeout=None):
+        return await self.__call('is_open', timeout=timeout)
+
+    # --- NC情報取得関連 ---
+
+    async def get_drive_infomation(self, timeout=None):
+        return await self.__call('get_drive_infomation', timeout=timeout)
+
+    async def get_version(self, timeout=None):
+        return await self.__call('get_version', timeout=timeout)
+
+    async def get_current_position(self, axisno, timeout=None):
+        return await self.__call('get_current_position', axisno, timeout=timeout)
+
+    async def get_run_status(self, timeout=None):
+        return await self.__call('get_run_status', timeout=timeout)
+
+    async def get_rpm(self, timeout=None):
+        return await self.__call('get_rpm', timeout=timeout)
+
+    async def get_load(self, timeout=None):
+        return await self.__call('get_load', timeout=timeout)
+
+    async def get_spindle_monitor(self, params, spindles=(1,), with_info=False, as_numpy=False, timeout=None):
+        return await self.__call('get_spindle_monitor', params, spindles, with_info, as_numpy, timeout=timeout)
+
+    async def get_mgn_size(self, timeout=None):
+        return await self.__call('get_mgn_size', timeout=timeout)
+
+    async def get_mgn_ready(self, timeout=None):
+        return await self.__call('get_mgn_ready', timeout=timeout)
+
+    async def get_toolset_size(self, timeout=None):
+        return await self.__call('get_toolset_size', timeout=timeout)
+
+    async def get_tool_offset_h(self, toolset_no, timeout=None):
+        return await self.__call('get_tool_offset_h', toolset_no, timeout=timeout)
+
+    async def get_tool_offset_d(self, toolset_no, timeout=None):
+        return await self.__call('get_tool_offset_d', toolset_no, timeout=timeout)
+
+    async def set_tool_offset_h(self, toolset_no, h, timeout=None):
+        return await self.__call('set_tool_offset_h', toolset_no, h, timeout=timeout)
+
+    async def set_tool_offset_d(self, toolset_no, d, timeout=None):
+        return await self.__call('set_tool_offset_d', toolset_no, d, timeout=timeout)
+
+    async def get_program_number(self, progtype, timeout=None):
+        return await self.__call('get_program_number', progtype, timeout=timeout)
+
+    async def get_alerm(self, timeout=None):
+        return await self.__call('get_alerm', timeout=timeout)
+
+    # --- NCプログラムファイル操作関連 ---
+
+    async def read_file(self, path, timeout=None):
+        return await self.__call('read_file', path, timeout=timeout)
+
+    async def write_file(self, path, data, timeout=None):
+        return await self.__call('write_file', path, data, timeout=timeout)
+
+    async def delete_file(self, path, timeout=None):
+        return await self.__call('delete_file', path, timeout=timeout)
+
+    # --- NCディレクトリ操作関連 --
+
+    async def find_dir(self, path, timeout=None):
+        return await self.__call('find_dir', path, timeout=timeout)
+
+    # --- NCデバイス操作関連 ---
+
+    async def read_dev(self, dev, timeout=None):
+        return await self.__call('read_dev', dev, timeout=timeout)
+
+    async def write_dev(self, dev, data, timeout=None):
+        return await self.__call('write_dev', dev, data, timeout=timeout)
+
+    async def read_devs(self, devs, timeout=None):
+        return await self.__call('read_devs', devs, timeout=timeout)
+
+    async def write_devs(self, devs, data, timeout=None):
+        return await self.__call('write_devs', devs, data, timeout=timeout)
@@ -0,0 +1,242 @@
+# coding: utf-8
+'''
+多数のM700から定期的に値を収集する。
+
+1プロセスで多数のNCをポーリングすると、VARIANTの変換や例外処理がGILで直列化され
+1コアで頭打ちになるため、ホストを複数のワーカープロセスに分割して収集する。
+各ワーカープロセスは自身のCOMアパートメントとユニット番号空間（1-255）を持つので、
+フリート全体の台数は255台に制限されない。
+
+収集した最新値は multiprocessing.shared_memory 上の固定長テーブルに書き込まれ、
+親プロセスはpickleを介さずに直接読み出す。
+'''
+import math
+import multiprocessing
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from m700 import M700
+
+
+class _Table():
+    '''共有メモリ上の結果テーブル。
+
+    1ホスト1行で、行のレイアウトは [seq(uint64), 時刻(double), 正常フラグ(uint64), 値(double)*メトリクス数]。
+    seqは書き込み中に奇数、書き込み完了で偶数になる（シーケンスロック）。
+    読み出し側は前後でseqが一致し偶数である場合のみ値を採用するので、ロックが不要。
+    書き込み側は時刻、正常フラグ、値を全て書き終えてから、最後にseqだけを偶数にする。
+    '''
+
+    def __init__(self, buf, nmetrics):
+        self.__buf = buf
+        self.__head = struct.Struct('<QdQ')
+        self.__seq = struct.Struct('<Q')
+        self.__body = struct.Struct('<dQ')
+        self.__values = struct.Struct('<' + 'd' * nmetrics)
+        self.__rowsize = self.__head.size + self.__values.size
+
+    @staticmethod
+    def size(nhosts, nmetrics):
+        return nhosts * (struct.calcsize('<QdQ') + 8 * nmetrics)
+
+    def write(self, row, timestamp, ok, values):
+        offset = row * self.__rowsize
+        # 書き込み中にワーカーが異常終了するとseqが奇数のまま残るため、
+        # 前回の値に関わらず書き込み中は奇数、書き込み完了で偶数にする
+        seq = self.__seq.unpack_from(self.__buf, offset)[0] | 1
+        self.__seq.pack_into(self.__buf, offset, seq)
+        self.__body.pack_into(self.__buf, offset + self.__seq.size, timestamp, 1 if ok else 0)
+        self.__values.pack_into(self.__buf, offset + self.__head.size, *values)
+        # 全ての値を書き終えてから公開する
+        self.__seq.pack_into(self.__buf, offset, seq + 1)
+
+    def read(self, row, timeout=1.0):
+        '''行を読み出す。
+
+        Raises:
+            Exception: timeout秒以内に書き込み完了の状態を読み出せなかった場合
+        '''
+        offset = row * self.__rowsize
+        deadline = time.monotonic() + timeout
+        while True:
+            seq, timestamp, ok = self.__head.unpack_from(self.__buf, offset)
+            if seq % 2 == 0:
+                values = self.__values.unpack_from(self.__buf, offset + self.__head.size)
+                if self.__seq.unpack_from(self.__buf, offset)[0] == seq:
+                    return seq // 2, timestamp, bool(ok), values
+            if time.monotonic() > deadline:
+                raise Exception('共有メモリの行が書き込み中のまま読み出せません。row=' + str(row))
+            time.sleep(0)
+
+
+def _read_metric(m700, metric):
+    '''メトリクス名から値を読み出す。get_*はメソッド呼び出し、それ以外はデバイスとして読み出す。'''
+    if metric.startswith('get_'):
+        value = getattr(m700, metric)()
+    else:
+        value = m700.read_dev(metric)
+    if isinstance(value, M700.RunStatus):
+        value = value.value
+    return float(value)
+
+
+def _poll_host(table, row, host, metrics, interval, stop_event, backend=None):
+    '''1ホスト分のポーリングループ。COMオブジェクトはこのスレッド内でのみ利用する。'''
+    m700 = M700.get_connection(host) if backend is None else M700(host, backend=backend)
+    nan = [math.nan] * len(metrics)
+    try:
+        while not stop_event.is_set():
+            start = time.monotonic()
+            try:
+                values = [_read_metric(m700, metric) for metric in metrics]
+                table.write(row, time.time(), True, values)
+            except:
+                table.write(row, time.time(), False, nan)
+            stop_event.wait(max(0, interval - (time.monotonic() - start)))
+    finally:
+        m700.close()
+
+
+def _run_shard(shm_name, shard, metrics, interval, stop_event, backend=None):
+    '''担当ホスト群をホストごとのスレッドでポーリングする。ワーカープロセスのエントリポイント。
+
+    Args:
+        shard (list): (テーブルの行番号, ホスト) のリスト
+        backend (callable): M700に渡すCOMオブジェクトの代わりを生成する関数
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        table = _Table(shm.buf, len(metrics))
+        threads = [threading.Thread(target=_poll_host, args=(table, row, host, metrics, interval, stop_event, backend), daemon=True)
+                   for row, host in shard]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        del table
+    finally:
+        shm.close()
+
+
+class Collector():
+
+    class Mode():
+        '''収集方式'''
+        THREAD = 'thread'   # 1プロセス内でホストごとにスレッド
+        PROCESS = 'process' # ホストをワーカープロセスに分割し、各プロセス内でホストごとにスレッド
+
+    def __init__(self, hosts, metrics, interval=1.0, mode='process', workers=None, backend=None):
+        '''
+        Args:
+            hosts (list): 収集対象のホスト（IPアドレス:ポート番号）のリスト
+            metrics (list): 収集するメトリクス。'get_rpm'などの引数なしのget_*メソッド名、又は'M900'などのデバイス
+            interval (float): ポーリング周期[秒]
+            mode (str): Collector.Mode.THREAD or Collector.Mode.PROCESS
+            workers (int): ワーカープロセス数。Noneの場合はCPU数
+            backend (callable): M700(host, backend=...)に渡すCOMオブジェクトの代わりを生成する関数。
+                                Noneの場合はEZSocketを利用する。PROCESSの場合はpickleできること
+                                exp) functools.partial(m700_trace.ReplayEZCom, 'trace.jsonl')
+        '''
+        if mode not in (Collector.Mode.THREAD, Collector.Mode.PROCESS):
+            raise Exception('modeにはCollector.Mode.*を指定してください。')
+        self.__hosts = list(hosts)
+        self.__rows = {host: i for i, host in enumerate(self.__hosts)}
+        self.__metrics = list(metrics)
+        self.__interval = interval
+        self.__mode = mode
+        self.__backend = backend
+        nworkers = min(workers or multiprocessing.cpu_count(), len(self.__hosts)) or 1
+        # ホストを行番号順に均等に割り振る
+        self.__shards = [[(i, h) for i, h in enumerate(self.__hosts) if i % nworkers == w] for w in range(nworkers)]
+        self.__shm = None
+        self.__table = None
+        self.__stop_event = None
+        self.__workers = []
+        self.__supervisor = None
+        self.__restarts = 0
+
+    def start(self):
+        '''収集を開始する。'''
+        if self.__shm is not None:
+            return
+        self.__shm = shared_memory.SharedMemory(create=True, size=_Table.size(len(self.__hosts), len(self.__metrics)))
+        self.__table = _Table(self.__shm.buf, len(self.__metrics))
+        self.__stop_event = multiprocessing.Event()
+        if self.__mode == Collector.Mode.THREAD:
+            shard = [row for shard in self.__shards for row in shard]
+            self.__workers = [threading.Thread(target=_run_shard, daemon=True,
+                                               args=(self.__shm.name, shard, self.__metrics, self.__interval, self.__stop_event, self.__backend))]
+            self.__workers[0].start()
+        else:
+            self.__workers = [self.__start_process(shard) for shard in self.__shards]
+            self.__supervisor = threading.Thread(target=self.__supervise, daemon=True)
+            self.__supervisor.start()
+
+    def stop(self, timeout=10):
+        '''収集を停止し、共有メモリを解放する。'''
+        if self.__shm is None:
+            return
+        self.__stop_event.set()
+        if self.__supervisor is not None:
+            self.__supervisor.join()
+            self.__supervisor = None
+        for w in self.__workers:
+            w.join(timeout)
+            if isinstance(w, multiprocessing.Process) and w.is_alive():
+                w.terminate()
+        self.__workers = []
+        self.__table = None
+        self.__shm.close()
+        self.__shm.unlink()
+        self.__shm = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __start_process(self, shard):
+        p = multiprocessing.Process(target=_run_shard, daemon=True,
+                                    args=(self.__shm.name, shard, self.__metrics, self.__interval, self.__stop_event, self.__backend))
+        p.start()
+        return p
+
+    def __supervise(self):
+        '''異常終了したワーカープロセスを同じ担当ホストで再起動する。'''
+        while not self.__stop_event.wait(1.0):
+            for i, p in enumerate(self.__workers):
+                if not p.is_alive():
+                    self.__workers[i] = self.__start_process(self.__shards[i])
+                    self.__restarts += 1
+
+    def restarts(self):
+        '''ワーカープロセスを再起動した回数を返す。'''
+        return self.__restarts
+
+    def read(self, host):
+        '''ホストの最新値を共有メモリから読み出す。
+
+        Return:
+            dict: exp) { 'count': 12, 'timestamp': 1500000000.0, 'ok': True, 'values': {'get_rpm': 1200.0, ...} }
+                  countは書き込み回数。一度も書き込まれていない場合は0。
+                  okがFalseの場合、最後の収集でエラーが発生しており、valuesは全てnan。
+        '''
+        count, timestamp, ok, values = self.__table.read(self.__rows[host])
+        return {
+            'count': count,
+            'timestamp': timestamp,
+            'ok': ok,
+            'values': dict(zip(self.__metrics, values))
+        }
+
+    def read_all(self):
+        '''全ホストの最新値を読み出す。
+
+        Return:
+            dict: ホストをキーとした、readの戻り値の辞書
+        '''
+        return {host: self.read(host) for host in self.__hosts}
@@ -0,0 +1,273 @@
+# coding: utf-8
+'''
+EZSocketのエラーコード一覧。
+
+1行1エラーで「16進数エラーコード エラー内容」の形式で登録する。
+m700.decode_error()が初めて呼ばれた時に辞書へ変換されるため、エラーが起きない限り読み込まれない。
+'''
+ERRORS = '''\
+80a00101 通信回線がオープンされていません
+80a00104 2重オープンエラー
+80a00105 引数のデータタイプが不正
+80a00106 引数のデータ範囲が不正
+80a00107 サポートしていない
+80a00109 通信回線がオープンできません
+80a0010a 引数がnullポインタです。
+80a0010b 引数のデータ不正
+80a0010c COMMポートハンドルエラー
+80b00101 メモリの確保ができない
+80b00102 EZSocketPcのエラーが取得できない
+80b00201 モード指定不正
+80b00202 未ファイルオープン
+80b00203 ファイルが既に存在する
+80b00204 既にファイルオープンしている
+80b00205 テンポラリファイルを作成できない
+80b00206 書き込みモード指定でファイルオープンしていない
+80b00207 書き込みデータサイズ不正
+80b00208 書き込みできない状態
+80b00209 読み出しモード指定でファイルオープンしていない
+80b0020a 読み出しできない状態
+80b0020b テンポラリファイルを作成できない
+80b0020c ファイルが存在しない（readモード）
+80b0020d ファイルがオープンできない
+80b0020e ファイルのパスが不正
+80b0020f 読み出しファイルが不正
+80b00210 書き込みファイルが不正
+80b00301 オートメーション呼び出しでローカル接続時のホスト名が不正
+80b00302 TCP/IP通信が設定されていない
+80b00303 既に通信中なので設定できない
+80b00304 下位モジュールがない
+80b00305 EZSocketPcオブジェクトが生成できない
+80b00401 データが存在しない
+80b00402 データ重複
+80b00501 パラメータ情報ファイルがない
+80020190 NCカード番号不正
+80020102 デバイスがオープンされていない
+80020132 コマンド不正
+80020133 通信パラメータデータ範囲不正
+80030143 ファイルシステムに異常がある
+80030191 ディレクトリが存在しない
+8003019b ドライブが存在しない
+800301a2 ディレクトリが存在しない
+800301a8 ドライブが存在しない
+80050d90 系統、軸指定が不正
+80050d02 アラーム種類が不正
+80050d03 NCとPC間の通信データにエラーがある
+80041194 寿命管理データの種類指定不正
+80041195 設定データ範囲オーバ
+80041196 設定工具番号不一致
+80041197 指定工具番号が仕様外
+80040190 系統、軸指定が不正
+80040191 大区分番号不正
+80040192 小区分番号不正
+80040196 アプリケーションが用意したバッファに入りきらない
+80040197 データタイプ不正
+8004019d データが読み出せない状態にある
+8004019f 書き込み専用データ
+800401a0 軸指定不正
+800401a1 データ番号不正
+800401a3 読み出しデータなし
+8004019a 読み出しデータ範囲不正
+80040290 系統、軸指定が不正
+80040291 大区分番号不正
+80040292 小区分番号不正
+80040296 アプリケーションが用意したバッファに入りきらない
+80040297 データタイプ不正
+8004029b 読み出し専用データ
+8004029e データが書き込めない状態にある
+800402a0 軸指定不正
+8004024d 安全パスワードロック中
+800402a2 SRAM開放パラメータ不正によりフォーマット中止した
+800402a4 編集ァイルを登録できない(既に編集中)
+800402a5 編集ファイルを解除できない
+800402a3 書き込み先データなし
+8004029a 書き込みデータ範囲不正
+800402a6 安全パスワード未設定
+800402a7 安全データ整合性チェックエラー
+800402a9 安全用データタイプ不
+800402a8 工具データソート中で書き込みできない
+80040501 高速読み出し登録されていない
+80040402 プライオリティ指定不正
+80040401 登録数をオーバした
+80040490 アドレス不正
+80040491 大区分番号不正
+80040492 小区分番号不正
+80040497 データタイプ不正
+8004049b 読み出し専用データ
+8004049d データが読み出せない状態にある
+8004049f 書き込み専用データ
+800404a0 軸指定不正
+80040ba3 再ねじ切り位置設定なし
+80030101 既に別ディレクトリがオープンされている
+80030103 データサイズオーバ
+80030148 ファイル名が長い
+80030198 ファイル名フォーマットが不正
+80030190 オープンされていない
+80030194 ファイル情報リードエラー
+80030102 すでに別ディレクトリがオープンされている(PCのみ)
+800301a0 オープンされていない
+800301a1 ファイルが存在しない
+800301a5 ファイル情報リードエラー
+80030447 コピーできない状態にある(運転中)
+80030403 登録本数オーバ
+80030401 コピー先ファイルが既に存在する
+80030443 ファイルシステムに異常がある
+80030448 ファイル名が長い
+80030498 ファイル名フォーマットが不正
+80030404 メモリ容量オーバ
+80030491 ディレクトリが存在しない
+8003049b ドライブが存在しない
+80030442 ファイルが存在しない
+80030446 コピーできない状態にある(PLC動作中)
+80030494 転送元ファイルが読めない
+80030495 転送先ファイルに書き込めない
+8003044a コピーできない状態にある(プロテクト中)
+80030405 照合エラー
+80030449 照合機能をサポートしていない
+8003044c ファイルコピー中
+80030490 ファイルがオープンされていない
+8003044d 安全パスワードロック中
+8003049d ファイルフォーマット不正
+8003049e パスワードが異なる
+800304a4 ファイルが生成できない(PCのみ)
+800304a3 ファイルをオープンできない(PCのみ)
+80030402 コピー先ファイルが既に存在する
+800304a7 ファイル名フォーマットが不正
+800304a2 ディレクトリが存在しない
+800304a8 ドライブが存在しない
+800304a1 ファイルが存在しない
+800304a5 転送元ファイルが読めない
+800304a6 転送先ファイルに書き込めない
+80030406 ディスク容量オーバ
+800304a0 ファイルがオープンされていない
+80030201 削除できないファイル
+80030242 ファイルが存在しない
+80030243 ファイルシステムに異常がある
+80030247 削除できない状態にある(運転中)
+80030248 ファイル名が長い
+8003024a ファイルが削除できない状態にある(プロテクト中)
+80030291 ディレクトリが存在しない
+80030298 ファイル名フォーマットが不正
+8003029b ドライブが存在しない
+80030202 削除できないファイル
+800302a7 ファイル名フォーマットが不正
+800302a2 ディレクトリが存在しない
+800302a8 ドライブが存在しない
+800302a1 ファイルが存在しない
+80030301 新ファイル名が既に存在する
+80030342 ファイルが存在しない
+80030343 ファイルシステムに異常がある
+80030347 リネームできない状態にある(運転中)
+80030348 ファイル名が長い
+8003034a リネームできない状態にある(プロテクト中)
+80030391 ディレクトリが存在しない
+80030398 ファイル名フォーマットが不正
+8003039b ドライブが存在しない
+80030303 リネームできない
+80030305 新旧ファイル名が同じ
+80030302 新ファイル名が既に存在する
+800303a7 ファイル名フォーマットが不正
+800303a2 ディレクトリが存在しない
+800303a8 ドライブが存在しない
+800303a1 ファイルが存在しない
+80030691 ディレクトリが存在しない
+8003069b ドライブが存在しない
+80030643 ファイルシステムに異常がある
+80030648 ファイル名が長いまたはフォーマットが不正
+800306a2 ディレクトリが存在しない(PCのみ)
+800306a8 ドライブが存在しない(PCのみ)
+80030701 アプリケーションが用意したバッファに入りきらない
+80030794 ドライブ情報リードエラー
+82020001 すでにオープンされている
+82020002 オープンされていない
+82020004 カードが存在しない
+82020006 チャンネル番号不正
+82020007 ファイルディスクプリタ不正
+8202000a コネクトされていない
+8202000b クローズされていない
+82020014 タイムアウト
+82020015 データ不正
+82020016 キャンセル要求により終了した
+82020017 パケットサイズ不正
+82020018 タスク終了により終了した
+82020032 コマンド不正
+82020033 設定データ不正
+80060001 データリードキャッシュが無効
+80060090 アドレス不正
+80060091 大区分番号不正
+80060092 小区分番号不正
+80060097 データタイプ不正
+8006009a データ範囲不正
+8006009d データが読み出せない状態にある
+8006009f データタイプ不正
+800600a0 軸指定不正
+80070140 作業領域を確保できない
+80070142 ファイルをオープンできない
+80070147 ファイルがオープンできない状態にある(運転中)
+80070148 ファイルパスが長い
+80070149 未サポート(CF未対応)
+80070192 すでにオープンされている
+80070199 最大ファイルオープン数を越えた
+8007019f 工具データソート中でオープンができない
+800701b0 安全パスワードが未認証
+80070290 ファイルがオープンされていない
+80070340 作業領域を確保できない
+80070347 ファイルが生成できない状態にある(運転中)
+80070348 ファイルパスが長い
+80070349 未サポート(CF未対応)
+80070392 すでに生成されている
+80070393 ファイルを生成できない
+80070399 最大ファイルオープン数を越えた
+8007039b ドライブが存在しない
+80070490 ファイルがオープンされていない
+80070494 ファイル情報リードエラー
+80070549 書き込み不可
+80070590 ファイルがオープンされていない
+80070595 ファイル書き込みエラー
+80070740 ファイル削除エラー
+80070742 ファイルが存在しない3-6
+80070747 ファイルが削除できない状態にある(運転中)
+80070748 ファイルパスが長い
+80070749 未サポート(CF未対応)
+80070792 ファイルがオープンされている
+8007079b ドライブが存在しない
+80070842 ファイルが存在しない
+80070843 リネームできないファイル
+80070848 ファイルパスが長い
+80070849 未サポート(CF未対応)
+80070892 ファイルがオープンされている
+80070899 最大ファイルオープン数を越えた
+8007089b ドライブが存在しない
+80070944 コマンド不正(未対応)
+80070990 オープンされていない
+80070994 リードエラー
+80070995 ライトエラー
+80070996 アプリケーションが用意したバッファに入りきらない
+80070997 データタイプ不正
+80070949 未サポート(CF未対応)
+80070a40 作業領域を確保できない
+80070a47 ディレクトリがオープンできない状態にある(運転中)
+80070a48 ファイルパスが長い
+80070a49 未サポート(CF未対応)
+80070a91 ディレクトリが存在しない
+80070a92 すでにオープンされている
+80070a99 最大ディレクトリオープン数を越えた
+80070a9b ドライブが存在しない
+80070b90 ディレクトリがオープンされていない
+80070b91 ディレクトリが存在しない
+80070b96 アプリケーションが用意したバッファに入りきらない
+80070d90 ディレクトリがオープンされていない
+80070e48 ファイルパスが長い
+80070e49 サポート(CF未対応)
+80070e94 ファイル情報読み込みエラー
+80070e99 最大ファイルオープン数を越えた
+80070e9b ドライブが存在しない
+80070f48 ファイルパスが長い
+80070f49 未サポート(CF未対応)
+80070f94 ファイル情報読み込みエラー
+80070f90 ファイルがオープンされていないた
+80070f9b ドライブが存在しない
+8007099c SRAM開放パラ不正でフォーマット中止
+f00000ff 引数が不正
+ffffffff データが読み出せない/書き込めない状態
+'''
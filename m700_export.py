@@ -0,0 +1,229 @@
+# coding: utf-8
+'''
+収集した値を時系列データとしてファイルに出力する。
+
+値は列ごとのリストにまとめて溜め、行数又は経過時間でバッチとして区切り、
+バックグラウンドの書き込みスレッドで gzip圧縮CSV 又は Parquet（pyarrowが必要）に出力する。
+書き込み待ちのバッチ数には上限があり、ディスクへの書き込みが追いつかない場合は
+サンプリングを止めずに、書き込み待ちに入れられないバッチを破棄する。
+'''
+import csv
+import gzip
+import queue
+import threading
+import time
+
+
+class Exporter():
+
+    class Format():
+        '''出力形式'''
+        CSV = 'csv'         # gzip圧縮CSV (*.csv.gz)
+        PARQUET = 'parquet' # Parquet (*.parquet) pyarrowが必要
+
+    def __init__(self, path, columns, format='csv', batch_rows=1000, batch_seconds=10.0,
+                 rotate_rows=1000000, max_batches=16, compression=None, types=None):
+        '''
+        Args:
+            path (str): 出力ファイルのパス（拡張子無し）。ローテーションの連番と拡張子が付く。 exp) data -> data_00000.csv.gz
+            columns (list): 列名のリスト。先頭には自動で'timestamp'列が追加される
+            format (str): Exporter.Format.CSV or Exporter.Format.PARQUET
+            batch_rows (int): バッチを区切る行数
+            batch_seconds (float): バッチを区切る経過時間[秒]
+            rotate_rows (int): 1ファイルの最大行数。超えると次のファイルに切り替える
+            max_batches (int): 書き込み待ちのバッチ数の上限
+            compression (str): Parquetの圧縮方式。Noneの場合はpyarrowの既定値
+            types (dict): Parquetの列の型。列名とpyarrowの型名の辞書 exp) {'alarm': 'string'}
+                          指定しない列はfloat64とする（timestamp列も同様）
+        '''
+        if format == Exporter.Format.PARQUET:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise Exception('Parquetで出力するにはpyarrowをインストールしてください。')
+        elif format != Exporter.Format.CSV:
+            raise Exception('formatにはExporter.Format.*を指定してください。')
+        self.__path = path
+        self.__columns = ['timestamp'] + list(columns)
+        self.__format = format
+        self.__batch_rows = batch_rows
+        self.__batch_seconds = batch_seconds
+        self.__rotate_rows = rotate_rows
+        self.__compression = compression
+        self.__types = dict(types or {})
+
+        self.__lock = threading.Lock()
+        self.__buffer = self.__new_buffer()
+        self.__batch_start = time.monotonic()
+        self.__queue = queue.Queue(max_batches)
+        self.__dropped = 0
+        self.__error = None
+        self.__files = []
+        self.__closed = False
+        self.__writer = threading.Thread(target=self.__run, daemon=True)
+        self.__writer.start()
+
+    def __new_buffer(self):
+        return [[] for _ in self.__columns]
+
+    def add(self, values, timestamp=None):
+        '''1行分のサンプルを追加する。ディスクへの書き込みを待つことはない。
+
+        Args:
+            values (dict or list): 列名をキーとした辞書、又はcolumnsと同じ順の値のリスト
+            timestamp (float): サンプルの時刻。Noneの場合はtime.time()
+        '''
+        if isinstance(values, dict):
+            values = [values.get(c) for c in self.__columns[1:]]
+        elif len(values) != len(self.__columns) - 1:
+            raise Exception('値の数が列の数と一致しません。')
+        with self.__lock:
+            if self.__closed:
+                raise Exception('Exporterは既に閉じられています。')
+            self.__buffer[0].append(time.time() if timestamp is None else timestamp)
+            for column, value in zip(self.__buffer[1:], values):
+                column.append(value)
+            if len(self.__buffer[0]) >= self.__batch_rows or time.monotonic() - self.__batch_start >= self.__batch_seconds:
+                self.__cut_batch()
+
+    def __cut_batch(self):
+        '''溜めた値をバッチとして書き込み待ちにする。ロックを取得した状態で呼び出すこと。
+        書き込み待ちが上限に達している場合は、サンプリングを止めないためにバッチを破棄する。
+        '''
+        batch = self.__take_batch()
+        if batch is not None:
+            try:
+                self.__queue.put_nowait(batch)
+            except queue.Full:
+                self.__dropped += len(batch[0])
+
+    def __take_batch(self):
+        '''溜めた値をバッチとして取り出す。ロックを取得した状態で呼び出すこと。値が無い場合はNone。'''
+        batch = self.__buffer if self.__buffer[0] else None
+        if batch is not None:
+            self.__buffer = self.__new_buffer()
+        self.__batch_start = time.monotonic()
+        return batch
+
+    def flush(self):
+        '''溜めている値を書き込み待ちにし、全ての書き込みが終わるまで待つ。'''
+        with self.__lock:
+            batch = self.__take_batch()
+        # 溜めている値は破棄せず、書き込み待ちに空きができるまで待つ
+        if batch is not None:
+            self.__queue.put(batch)
+        self.__queue.join()
+
+    def close(self):
+        '''溜めている値を書き出して、ファイルを閉じる。'''
+        with self.__lock:
+            if self.__closed:
+                return
+            batch = self.__take_batch()
+            self.__closed = True
+        if batch is not None:
+            self.__queue.put(batch)
+        self.__queue.put(None)
+        self.__writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def dropped(self):
+        '''書き込みが追いつかない、又は書き込みに失敗して破棄した行数を返す。'''
+        return self.__dropped
+
+    def error(self):
+        '''最後に発生した書き込みエラーを返す。エラーが無い場合はNone。'''
+        return self.__error
+
+    def files(self):
+        '''これまでに作成したファイルのリストを返す。'''
+        return list(self.__files)
+
+    # --- 書き込みスレッド ---
+
+    def __run(self):
+        out = None
+        rows = 0
+        try:
+            while True:
+                try:
+                    batch = self.__queue.get(timeout=self.__batch_seconds)
+                except queue.Empty:
+                    # 一定時間経過した値もバッチとして区切る
+                    with self.__lock:
+                        if not self.__closed and time.monotonic() - self.__batch_start >= self.__batch_seconds:
+                            self.__cut_batch()
+                    continue
+                try:
+                    if batch is None:
+                        break
+                    if out is None or rows >= self.__rotate_rows:
+                        if out is not None:
+                            out.close()
+                        out = self.__open_file(len(self.__files))
+                        rows = 0
+                    out.write(batch)
+                    rows += len(batch[0])
+                except Exception as e:
+                    # サンプリング側のスレッドもロックを取得して更新するため、ロック内で更新する
+                    with self.__lock:
+                        self.__error = e
+                        self.__dropped += len(batch[0])
+                finally:
+                    self.__queue.task_done()
+        finally:
+            if out is not None:
+                out.close()
+
+    def __open_file(self, index):
+        if self.__format == Exporter.Format.PARQUET:
+            path = '{}_{:05d}.parquet'.format(self.__path, index)
+            out = _ParquetFile(path, self.__columns, self.__types, self.__compression)
+        else:
+            path = '{}_{:05d}.csv.gz'.format(self.__path, index)
+            out = _CsvFile(path, self.__columns)
+        self.__files.append(path)
+        return out
+
+
+class _CsvFile():
+    '''gzip圧縮CSVへの書き込み'''
+
+    def __init__(self, path, columns):
+        self.__file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.__writer = csv.writer(self.__file)
+        self.__writer.writerow(columns)
+
+    def write(self, batch):
+        self.__writer.writerows(zip(*batch))
+
+    def close(self):
+        self.__file.close()
+
+
+class _ParquetFile():
+    '''Parquetへの書き込み。1バッチを1行グループとして書き込む。
+    スキーマは最初のバッチの値からではなく、指定された列の型から作成する。
+    '''
+
+    def __init__(self, path, columns, types, compression):
+        import pyarrow
+        import pyarrow.parquet
+        self.__pa = pyarrow
+        self.__schema = pyarrow.schema(
+            [(c, pyarrow.type_for_alias(types.get(c, 'float64'))) for c in columns])
+        kwargs = {} if compression is None else {'compression': compression}
+        self.__writer = pyarrow.parquet.ParquetWriter(path, self.__schema, **kwargs)
+
+    def write(self, batch):
+        arrays = [self.__pa.array(values, type=field.type) for values, field in zip(batch, self.__schema)]
+        self.__writer.write_table(self.__pa.Table.from_arrays(arrays, schema=self.__schema))
+
+    def close(self):
+        self.__writer.close()
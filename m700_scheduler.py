@@ -0,0 +1,256 @@
+# coding: utf-8
+'''
+M700への定期的な問い合わせをまとめて行うスケジューラ。
+
+利用者ごとに個別にM700のメソッドを呼び出すと、同じ問い合わせが重複し、NCへの通信が集中するため、
+利用者はメトリクス（get_*メソッド、デバイスのリスト、find_dirのパス）を周期と優先度付きで登録し、
+スケジューラが同一の問い合わせをまとめ、ホストごとのCOM呼び出し回数の上限内で実行する。
+利用者はキャッシュされた最新値を取得する。
+'''
+import itertools
+import threading
+import time
+
+from m700 import M700
+
+
+# メソッド1回あたりのCOM呼び出し回数。記載の無いメソッドは1回
+_COM_CALLS = {
+    'read_dev': 3,  # Device_SetDevice, Device_Read, Device_DeleteAll
+    'read_devs': 3,
+    'find_dir': 4,  # File_FindDir2 x2, File_ResetDir x2 （+ 1件ごとにFile_FindNextDir2）
+}
+
+
+def _com_calls(method, args, value):
+    '''M700のメソッド1回の呼び出しで行われたCOM呼び出しの回数を返す。
+    エラーで戻り値が無い場合(None)は、最低限の回数を返す。
+    '''
+    count = _COM_CALLS.get(method, 1)
+    if method == 'find_dir' and value is not None:
+        count += len(value)
+    elif method == 'get_spindle_monitor':
+        count = len(args[0]) * len(args[1] if len(args) > 1 else (1,))
+    return count
+
+
+class _Metric():
+    '''同一の問い合わせ（ホスト, メソッド, 引数）を1つにまとめたもの。'''
+
+    def __init__(self, method, args):
+        self.method = method
+        self.args = args
+        self.subscribers = {} # ハンドル: (周期, 優先度)
+        self.period = None
+        self.priority = None
+        self.next_due = 0.0
+        self.value = None
+        self.error = None
+        self.updated = None   # 最後に値を更新したtime.monotonic()
+        self.timestamp = None # 最後に値を更新したtime.time()
+        self.achieved = None  # 実際の更新周期の指数移動平均[秒]
+
+    def update_subscription(self):
+        '''登録者の中で最も短い周期と最も高い優先度を採用する。'''
+        self.period = min(p for p, _ in self.subscribers.values())
+        self.priority = max(p for _, p in self.subscribers.values())
+
+    def set_value(self, value, now):
+        if self.updated is not None:
+            interval = now - self.updated
+            self.achieved = interval if self.achieved is None else self.achieved * 0.8 + interval * 0.2
+        self.value = value
+        self.error = None
+        self.updated = now
+        self.timestamp = time.time()
+
+
+class Scheduler():
+
+    DEVICES = 'read_devs'
+
+    def __init__(self, max_calls_per_sec=10.0):
+        '''
+        Args:
+            max_calls_per_sec (float): ホストごとの1秒あたりのCOM呼び出し回数の上限。
+                                       find_dirやread_devsのように複数回のCOM呼び出しを行うメソッドは、その回数分として数える
+        '''
+        self.__min_gap = 1.0 / max_calls_per_sec
+        self.__lock = threading.Lock()
+        self.__metrics = {}    # ホスト: {(メソッド, 引数): _Metric}
+        self.__handles = {}    # ハンドル: (ホスト, (メソッド, 引数))
+        self.__handle_seq = itertools.count(1)
+        self.__workers = {}    # ホスト: threading.Thread
+        self.__wakeups = {}    # ホスト: threading.Event
+        self.__stop_event = threading.Event()
+        self.__started = False
+
+    def subscribe(self, host, method, *args, period=1.0, priority=0):
+        '''メトリクスを登録する。同じホスト・メソッド・引数の登録は1つの問い合わせにまとめられる。
+
+        Args:
+            host: IPアドレス:ポート番号
+            method (str): M700のメソッド名 exp) 'get_alerm', 'find_dir', Scheduler.DEVICES
+            args: メソッドの引数。Scheduler.DEVICESの場合はデバイス番号のリスト exp) ['M900', 'D200']
+            period (float): 希望する更新周期[秒]
+            priority (int): 優先度。大きいほど先に実行される
+        Return:
+            int: 登録のハンドル。get, unsubscribeに利用する。
+        '''
+        # リストの引数も辞書のキーにできるようtupleにする。同じ内容のリストとtupleは同一の問い合わせ
+        args = tuple(tuple(a) if isinstance(a, (list, tuple)) else a for a in args)
+        key = (method, args)
+        with self.__lock:
+            handle = next(self.__handle_seq)
+            metrics = self.__metrics.setdefault(host, {})
+            if key not in metrics:
+                metrics[key] = _Metric(method, args)
+            metrics[key].subscribers[handle] = (period, priority)
+            metrics[key].update_subscription()
+            self.__handles[handle] = (host, key)
+            if self.__started and host not in self.__workers:
+                self.__start_worker(host)
+        self.__wakeup(host)
+        return handle
+
+    def unsubscribe(self, handle):
+        '''メトリクスの登録を解除する。登録者がいなくなった問い合わせは実行されなくなる。'''
+        with self.__lock:
+            host, key = self.__handles.pop(handle)
+            metric = self.__metrics[host][key]
+            del metric.subscribers[handle]
+            if metric.subscribers:
+                metric.update_subscription()
+            else:
+                del self.__metrics[host][key]
+
+    def get(self, handle):
+        '''キャッシュされた最新値を返す。一度も取得できていない場合はNone。'''
+        with self.__lock:
+            host, key = self.__handles[handle]
+            return self.__metrics[host][key].value
+
+    def stats(self):
+        '''メトリクスごとの実行状況を返す。
+
+        Return:
+            list: exp) [{ 'host': '192.168.1.10:683', 'method': 'get_alerm', 'args': (),
+                          'period': 0.2, 'achieved': 0.21, 'staleness': 0.05, 'subscribers': 2, 'error': None }, ...]
+                  achievedは実際の更新周期[秒]、stalenessは最後に更新してからの経過時間[秒]。
+                  一度も更新できていない場合はどちらもNone。
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            return [{
+                'host': host,
+                'method': m.method,
+                'args': m.args,
+                'period': m.period,
+                'achieved': m.achieved,
+                'staleness': None if m.updated is None else now - m.updated,
+                'subscribers': len(m.subscribers),
+                'error': m.error
+            } for host, metrics in self.__metrics.items() for m in metrics.values()]
+
+    def start(self):
+        '''ホストごとのワーカースレッドを起動し、問い合わせを開始する。'''
+        with self.__lock:
+            if self.__started:
+                return
+            self.__started = True
+            self.__stop_event.clear()
+            for host in self.__metrics:
+                self.__start_worker(host)
+
+    def stop(self):
+        '''全てのワーカースレッドを停止する。'''
+        with self.__lock:
+            self.__started = False
+            self.__stop_event.set()
+            workers = list(self.__workers.values())
+            self.__workers = {}
+            wakeups = list(self.__wakeups.values())
+        for event in wakeups:
+            event.set()
+        for w in workers:
+            w.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __start_worker(self, host):
+        self.__wakeups.setdefault(host, threading.Event())
+        self.__workers[host] = threading.Thread(target=self.__run, args=(host,), daemon=True)
+        self.__workers[host].start()
+
+    def __wakeup(self, host):
+        event = self.__wakeups.get(host)
+        if event is not None:
+            event.set()
+
+    def __next_call(self, host, now):
+        '''実行期限を過ぎたメトリクスの中から、最も優先度の高い問い合わせを1つ選ぶ。
+        デバイスの問い合わせの場合は、期限を過ぎた他のデバイスの問い合わせも1回の読み出しにまとめる。
+
+        Return:
+            tuple: (メソッド, 引数, 対象の_Metricのリスト) 実行するものが無ければ (None, 次の実行期限)
+        '''
+        metrics = list(self.__metrics.get(host, {}).values())
+        due = [m for m in metrics if m.next_due <= now]
+        if not due:
+            return None, min((m.next_due for m in metrics), default=None)
+        first = min(due, key=lambda m: (-m.priority, m.next_due))
+        if first.method != Scheduler.DEVICES:
+            return first.method, first.args, [first]
+        targets = [m for m in due if m.method == Scheduler.DEVICES]
+        devs = list(dict.fromkeys(dev for m in targets for dev in m.args[0]))
+        return Scheduler.DEVICES, (devs,), targets
+
+    def __run(self, host):
+        '''ホストごとのワーカースレッド。COMオブジェクトはこのスレッド内でのみ利用する。'''
+        m700 = M700.get_connection(host)
+        wakeup = self.__wakeups[host]
+        next_allowed = 0.0
+        try:
+            while not self.__stop_event.is_set():
+                # COM呼び出し回数の上限を守るため、前回の呼び出しの回数分の間隔を空ける
+                gap = next_allowed - time.monotonic()
+                if gap > 0 and self.__stop_event.wait(gap):
+                    break
+
+                # 予定を読む前にクリアし、読んだ後のsubscribeによる起床を取りこぼさない
+                wakeup.clear()
+                now = time.monotonic()
+                with self.__lock:
+                    call = self.__next_call(host, now)
+                if call[0] is None:
+                    wakeup.wait(1.0 if call[1] is None else max(0, call[1] - now))
+                    continue
+
+                method, args, targets = call
+                start = time.monotonic()
+                try:
+                    value = getattr(m700, method)(*args)
+                    error = None
+                except Exception as e:
+                    value = None
+                    error = e
+                done = time.monotonic()
+                next_allowed = start + self.__min_gap * _com_calls(method, args, value)
+
+                with self.__lock:
+                    for m in targets:
+                        m.next_due = now + m.period
+                        if error is not None:
+                            m.error = error
+                        elif method == Scheduler.DEVICES:
+                            values = dict(zip(args[0], value))
+                            m.set_value([values[dev] for dev in m.args[0]], done)
+                        else:
+                            m.set_value(value, done)
+        finally:
+            m700.close()
@@ -0,0 +1,192 @@
+# coding: utf-8
+'''
+機種ごとのデバイス割り付けを、名前付きの信号として扱う。
+
+信号の定義ファイル（JSON、YAML、CSV）を読み込む際に一度だけ検証し、
+グループごとにデバイスのリストと読み出し後の変換（スケーリング、ビット分解）を事前に作成する。
+グループの読み出しは1回の通信で行い、信号名をキーとした辞書で返す。
+
+JSON、YAMLの形式:
+    {
+        "signals": {
+            "cycle_start": {"dev": "M900"},
+            "feed_override": {"dev": "D200", "scale": 0.1},
+            "status": {"dev": "D210", "bits": {"door_open": 0, "coolant": 3}}
+        },
+        "groups": {
+            "cycle": ["cycle_start", "status"]
+        }
+    }
+
+CSVの形式（1行目は見出し。bits、groupsは ; 区切りで複数指定）:
+    name,dev,scale,offset,bits,groups
+    cycle_start,M900,,,,cycle
+    feed_override,D200,0.1,,,
+    status,D210,,,door_open:0;coolant:3,cycle
+'''
+import csv
+import json
+import os
+
+from m700 import DeviceRequest, device_type
+
+
+class Signal():
+    '''検証済みの1信号の定義。'''
+
+    def __init__(self, name, dev, scale=None, offset=None, bits=None):
+        '''
+        Args:
+            name (str): 信号名
+            dev (str): デバイス番号 exp) M900, D200
+            scale (float): 読み出した値に掛ける係数。Noneなら変換しない
+            offset (float): 係数を掛けた後に足す値。Noneなら変換しない
+            bits (dict): ビット名とビット位置(0~15)の辞書。指定した場合は値を {ビット名: bool} に分解する
+        Raises:
+            Exception: 定義が不正な場合
+        '''
+        self.name = name
+        self.dev = dev
+        self.data_type = device_type(dev)
+        self.scale = None if scale is None else float(scale)
+        if self.scale == 0:
+            raise Exception('scaleに0は指定できません: ' + name)
+        self.offset = None if offset is None else float(offset)
+        self.bits = None
+        if bits:
+            if self.data_type != 4:
+                raise Exception('ビット分解はDデバイスのみ指定できます: ' + name)
+            if self.scale is not None or self.offset is not None:
+                raise Exception('ビット分解とスケーリングは同時に指定できません: ' + name)
+            self.bits = tuple((bit_name, int(pos)) for bit_name, pos in bits.items())
+            for bit_name, pos in self.bits:
+                if not 0 <= pos <= 15:
+                    raise Exception('ビット位置は0~15で指定してください: ' + name + '.' + bit_name)
+
+    def decode(self, raw):
+        '''読み出した値を信号の値に変換する。'''
+        if self.bits is not None:
+            return {bit_name: bool(raw >> pos & 1) for bit_name, pos in self.bits}
+        if self.scale is None and self.offset is None:
+            return raw
+        return raw * (1.0 if self.scale is None else self.scale) + (self.offset or 0.0)
+
+    def encode(self, value):
+        '''書き込む信号の値をデバイスの値に変換する。'''
+        if self.bits is not None:
+            raise Exception('ビット分解した信号には書き込めません: ' + self.name)
+        if self.scale is None and self.offset is None:
+            return int(value)
+        return int(round((value - (self.offset or 0.0)) / (1.0 if self.scale is None else self.scale)))
+
+
+class SignalGroup():
+    '''グループの読み出しに必要なデバイスのリストと変換を事前に作成したもの。'''
+
+    def __init__(self, name, signals):
+        self.name = name
+        self.signals = tuple(signals)
+        # 同じデバイスを参照する信号が複数あっても、読み出しは1回にまとめる
+        devs = list(dict.fromkeys(s.dev for s in self.signals))
+        self.request = DeviceRequest(devs)
+        self.__decoders = [(s.name, devs.index(s.dev), s.decode) for s in self.signals]
+
+    def decode(self, values):
+        '''read_devsで読み出した値を、信号名をキーとした辞書に変換する。'''
+        return {name: decode(values[i]) for name, i, decode in self.__decoders}
+
+
+class SignalMap():
+
+    @classmethod
+    def load(cls, path):
+        '''定義ファイルを読み込む。形式は拡張子で判断する（.json, .yaml, .yml, .csv）。
+        YAMLの読み込みにはPyYAMLが必要。
+
+        Raises:
+            Exception: 定義が不正な場合
+        '''
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.json':
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f))
+        elif ext in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise Exception('YAMLの定義ファイルを読み込むにはPyYAMLをインストールしてください。')
+            with open(path, encoding='utf-8') as f:
+                return cls(yaml.safe_load(f))
+        elif ext == '.csv':
+            with open(path, encoding='utf-8', newline='') as f:
+                return cls(cls.__from_csv(csv.DictReader(f)))
+        raise Exception('対応していない定義ファイルの形式です: ' + path)
+
+    @staticmethod
+    def __from_csv(rows):
+        '''CSVの行をJSON、YAMLと同じ形式の辞書に変換する。'''
+        signals = {}
+        groups = {}
+        for row in rows:
+            name = row['name'].strip()
+            signal = {'dev': row['dev'].strip()}
+            for key in ('scale', 'offset'):
+                if (row.get(key) or '').strip():
+                    signal[key] = row[key]
+            if (row.get('bits') or '').strip():
+                signal['bits'] = dict(b.strip().split(':') for b in row['bits'].split(';') if b.strip())
+            signals[name] = signal
+            for group in (row.get('groups') or '').split(';'):
+                if group.strip():
+                    groups.setdefault(group.strip(), []).append(name)
+        return {'signals': signals, 'groups': groups}
+
+    def __init__(self, definition):
+        '''
+        Args:
+            definition (dict): {'signals': {信号名: 定義}, 'groups': {グループ名: [信号名, ...]}}
+        Raises:
+            Exception: 定義が不正な場合
+        '''
+        self.__signals = {}
+        for name, d in (definition.get('signals') or {}).items():
+            try:
+                self.__signals[name] = Signal(name, d['dev'], d.get('scale'), d.get('offset'), d.get('bits'))
+            except KeyError:
+                raise Exception('devが指定されていません: ' + name)
+        self.__groups = {}
+        for name, members in (definition.get('groups') or {}).items():
+            for member in members:
+                if member not in self.__signals:
+                    raise Exception('グループ' + name + 'に未定義の信号が指定されています: ' + member)
+            self.__groups[name] = SignalGroup(name, [self.__signals[m] for m in members])
+
+    def signal(self, name):
+        '''信号の定義を返す。'''
+        return self.__signals[name]
+
+    def group(self, name):
+        '''グループを返す。'''
+        return self.__groups[name]
+
+    def read_group(self, m700, name):
+        '''グループの信号を1回の通信でまとめて読み出す。
+
+        Args:
+            m700 (M700): 接続
+            name (str): グループ名
+        Return:
+            dict: exp) {'cycle_start': 1, 'status': {'door_open': False, 'coolant': True}}
+        '''
+        group = self.__groups[name]
+        return group.decode(m700.read_devs(group.request))
+
+    def write(self, m700, values):
+        '''信号に1回の通信でまとめて書き込む。スケーリングを指定した信号は逆変換して書き込む。
+
+        Args:
+            m700 (M700): 接続
+            values (dict): 信号名をキーとした書き込む値 exp) {'cycle_start': 1, 'feed_override': 100.0}
+        '''
+        signals = [self.__signals[name] for name in values]
+        m700.write_devs([s.dev for s in signals], [s.encode(values[s.name]) for s in signals])
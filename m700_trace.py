@@ -0,0 +1,156 @@
+# coding: utf-8
+'''
+EZSocketのCOM呼び出しの記録と再生。
+
+実機で記録したトレースをWindows以外の環境でも再生できるようにし、
+read_fileやfind_dir、デバイスのポーリングなどの性能の変化を実機なしで計測する。
+
+トレースは1行1呼び出しのJSON Lines形式で、追記のみ行う。
+    {"t": 開始時刻, "h": "IPアドレス:ポート番号", "m": メソッド名, "a": 引数, "r": 戻り値,
+     "e": エラーコード, "x": 例外メッセージ, "d": 所要時間[秒]}
+'''
+import base64
+import collections
+import json
+import re
+import threading
+import time
+
+
+def _encode(value):
+    '''COMの引数、戻り値をJSONで表せる値に変換する。'''
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'b64': base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, (tuple, list)):
+        return [_encode(v) for v in value]
+    if hasattr(value, 'varianttype'): # win32com.client.VARIANT
+        return _encode(value.value)
+    return value
+
+
+def _decode(value):
+    '''_encodeで変換した戻り値を元に戻す。配列はCOMと同じくtupleで返す。'''
+    if isinstance(value, dict):
+        return base64.b64decode(value['b64'])
+    if isinstance(value, list):
+        return tuple(_decode(v) for v in value)
+    return value
+
+
+class TraceWriter():
+    '''トレースファイルへの追記。複数の接続（スレッド）から共有できる。'''
+
+    def __init__(self, path):
+        '''
+        Args:
+            path (str): トレースファイルのパス。既に存在する場合は追記する。
+        '''
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self.__lock:
+            self.__file.write(line)
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class TraceRecorder():
+    '''COMオブジェクトをラップし、全てのメソッド呼び出しをトレースに記録する。'''
+
+    def __init__(self, ezcom, writer, host):
+        self.__ezcom = ezcom
+        self.__writer = writer
+        self.__host = host
+
+    def __getattr__(self, name):
+        method = getattr(self.__ezcom, name)
+        def record(*args):
+            entry = {'t': time.time(), 'h': self.__host, 'm': name, 'a': _encode(args)}
+            start = time.perf_counter()
+            try:
+                ret = method(*args)
+            except Exception as e:
+                entry['d'] = time.perf_counter() - start
+                entry['x'] = str(e)
+                self.__writer.write(entry)
+                raise
+            entry['d'] = time.perf_counter() - start
+            entry['r'] = _encode(ret)
+            errcd = ret[0] if isinstance(ret, tuple) else ret
+            if isinstance(errcd, int):
+                entry['e'] = errcd
+            self.__writer.write(entry)
+            return ret
+        return record
+
+
+class ReplayEZCom():
+    '''トレースを再生するCOMオブジェクトの代替。M700(host, backend=...)に渡して利用する。
+
+    メソッドと引数の組み合わせごとに、記録された順に戻り値を返す。呼び出し順の変化に追従できるよう、
+    組み合わせをまたいだ順序は照合しない。記録に無い引数で呼び出した場合は例外とする。
+
+    ユニット番号はプロセスごとに割り当てられ、記録時と再生時で異なるため、
+    接続のメソッドは引数を照合せず、パスの先頭のユニット番号（M01:等）は区別しない。
+    '''
+
+    # 引数にユニット番号やIPアドレスを含み、メソッドだけで照合するもの
+    __method_only = ('SetTCPIPProtocol', 'Open2')
+    # find_dir等でユニット番号に置き換えられるパスの先頭 exp) M01:¥PRG¥USER¥ -> M02:¥PRG¥USER¥
+    __unit_prefix = re.compile(r'\bM[0-9A-F]{2}:')
+
+    def __init__(self, path, host=None, speed=1.0, loop=True):
+        '''
+        Args:
+            path (str): トレースファイルのパス
+            host (str): 再生するホスト（IPアドレス:ポート番号）。Noneの場合は全ホスト
+            speed (float): 再生速度の倍率。2.0なら記録時の半分の時間で応答する。Noneなら待たない
+            loop (bool): Trueなら、記録を使い切ったメソッドは先頭から繰り返す
+        '''
+        self.__speed = speed
+        self.__loop = loop
+        self.__records = collections.defaultdict(list)
+        self.__cursors = collections.defaultdict(int)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if host is None or record['h'] == host:
+                    self.__records[self.__key(record['m'], record['a'])].append(record)
+
+    @classmethod
+    def __key(cls, name, args):
+        '''メソッド名と_encodeで変換した引数から、照合に使うキーを作成する。'''
+        if name in cls.__method_only:
+            return (name, '')
+        args = [cls.__unit_prefix.sub('M__:', a) if isinstance(a, str) else a for a in args]
+        return (name, json.dumps(args, ensure_ascii=False, separators=(',', ':')))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        def replay(*args):
+            key = self.__key(name, _encode(args))
+            records = self.__records.get(key)
+            if not records:
+                raise Exception('トレースに記録されていない呼び出しです: ' + name + key[1])
+            i = self.__cursors[key]
+            if i >= len(records):
+                if not self.__loop:
+                    raise Exception('トレースの記録を使い切りました: ' + name + key[1])
+                i = 0
+            self.__cursors[key] = i + 1
+            record = records[i]
+            if self.__speed:
+                time.sleep(record['d'] / self.__speed)
+            if 'x' in record:
+                raise Exception(record['x'])
+            return _decode(record.get('r'))
+        return replay
@@ -6,10 +6,13 @@
       必ず安全を確かめ、テストコード内の操作を理解した上で実行して下さい。
 '''
 import os
+import subprocess
 import sys
+import threading
 import unittest
 
-from m700 import M700
+from m700 import M700, Pipeline, decode_error, device_type
+from test_m700_trace import FakeEZCom
 
 
 class TestM700(unittest.TestCase):
@@ -48,6 +51,14 @@ class TestM700(unittest.TestCase):
         self.assertIs(type(self.m700.get_program_number(M700.ProgramType.MAIN)), str)
         self.assertIs(type(self.m700.get_alerm()), str)
 
+    def test_spindle_monitor(self):
+        '''主軸モニタの一括取得テスト。'''
+        data, info = self.m700.get_spindle_monitor([2, 3], [1], with_info=True)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(len(data[0]), 1)
+        self.assertIs(type(data[0][0]), int)
+        self.assertIs(type(info[1][0]), str)
+
     def test_operate_program_file(self):
         '''加工プログラム読み書きテスト。'''
         drivenm = self.m700.get_drive_infomation()
@@ -65,6 +76,147 @@ class TestM700(unittest.TestCase):
         self.assertEqual(self.m700.read_dev('D200'), 10)
         self.m700.write_dev('D200', 0)
         self.assertEqual(self.m700.read_dev('D200'), 0)
+
+    def test_devs_operation(self):
+        '''M,Dデバイスの一括読み書きテスト。'''
+        self.m700.write_devs(['M900', 'D200'], [1, 10])
+        self.assertEqual(self.m700.read_devs(['M900', 'D200']), [1, 10])
+        self.m700.write_devs(['M900', 'D200'], [0, 0])
+        self.assertEqual(self.m700.read_devs(['M900', 'D200']), [0, 0])
+
+    def test_watch_devs(self):
+        '''デバイスの変化がコールバックで通知されるかテスト。'''
+        host = '192.168.48.173:683'
+        stop_event = threading.Event()
+        rising = threading.Event()
+        def toggle():
+            # 別スレッドなので別の接続を使う
+            m700 = M700.get_connection(host)
+            try:
+                # 周期を延ばしている監視が取りこぼさないよう、エッジを検出するまで1を保持する
+                m700.write_dev('M900', 1)
+                rising.wait(5)
+                m700.write_dev('M900', 0)
+            finally:
+                m700.close()
+                stop_event.set()
+        def on_change(dev, old, new):
+            changes.append((dev, old, new))
+            if (dev, old, new) == ('M900', 0, 1):
+                rising.set()
+        self.m700.write_dev('M900', 0)
+        changes = []
+        timer = threading.Timer(0.5, toggle)
+        timer.start()
+        stats = self.m700.watch_devs(['M900', 'D200'], on_change, interval=0.01, stop_event=stop_event)
+        timer.join()
+        self.assertIn(('M900', 0, 1), changes)
+        self.assertEqual(stats['edges'], len(changes))
+
+    def test_pipeline(self):
+        '''pipelineでまとめた操作が順に実行され、結果が返るかテスト。'''
+        with self.m700.pipeline() as p:
+            status = p.get_run_status()
+            p.write_dev('M900', 1)
+            p.write_dev('D200', 10)
+            m900 = p.read_dev('M900')
+            devs = p.read_devs(['M900', 'D200'])
+            p.write_devs(['M900', 'D200'], [0, 0])
+            d200 = p.read_dev('D200')
+        self.assertIs(type(status.result()), M700.RunStatus)
+        self.assertEqual(m900.result(), 1)
+        self.assertEqual(devs.result(), [1, 10])
+        self.assertEqual(d200.result(), 0)
+
+    def test_pipeline_error(self):
+        '''pipelineが最初のエラーで中断するかテスト。'''
+        with self.assertRaises(Exception):
+            with self.m700.pipeline() as p:
+                first = p.read_file('M01:¥PRG¥USER¥__NOT_EXISTS__')
+                second = p.read_dev('M900')
+        self.assertIsNotNone(first.exception())
+        self.assertTrue(second.cancelled())
+
+
+class TestM700Core(unittest.TestCase):
+    '''NCへの接続やpywin32を必要としない部分のテスト。'''
+
+    def test_import_without_com(self):
+        '''import m700 でpywin32や、pipelineでのみ利用するモジュールが読み込まれないかテスト。'''
+        code = ('import sys, m700; m700.M700.RunStatus.AUTO_RUN; '
+                'print([m for m in ("pythoncom", "concurrent.futures", "inspect") if m in sys.modules])')
+        out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual(out.strip(), '[]')
+
+    def test_decode_error(self):
+        '''エラーコードの解読テスト。'''
+        self.assertEqual(decode_error(0x80a00101), ('0x80a00101', '通信回線がオープンされていません'))
+        self.assertEqual(decode_error(-0x7f5ffeff), ('0x80a00101', '通信回線がオープンされていません'))
+        self.assertEqual(decode_error(0x80a00fff), ('0x80a00fff', 'Unkown error'))
+
+    def test_pipeline_queue(self):
+        '''pipelineに溜める時点で引数の誤りが検出されるかテスト。'''
+        p = Pipeline()
+        with self.assertRaises(Exception):
+            p.write_devs(['M900', 'M901'], [1])
+        with self.assertRaises(TypeError):
+            p.read_dev()
+        with self.assertRaises(AttributeError):
+            p.RunStatus
+        with self.assertRaises(AttributeError):
+            p.close
+        monitor = p.get_spindle_monitor([2, 3], spindles=[1, 2])
+
+        class FakeM700():
+            def get_spindle_monitor(self, params, spindles=(1,)):
+                return [[(param, spindle) for spindle in spindles] for param in params]
+        p.execute(FakeM700())
+        self.assertEqual(monitor.result(), [[(2, 1), (2, 2)], [(3, 1), (3, 2)]])
+
+    def test_spindle_monitor_backend(self):
+        '''複数の主軸、複数の項目がパラメータ順、主軸順に返るかテスト。'''
+        class SpindleEZCom(FakeEZCom):
+            def Monitor_GetSpindleMonitor(self, param, spindle):
+                return 0, param * 100 + spindle, 'S{}\0\0 '.format(spindle)
+        m700 = M700('127.0.0.1:683', backend=SpindleEZCom)
+        data, info = m700.get_spindle_monitor([2, 3], [1, 2], with_info=True)
+        self.assertEqual(data, [[201, 202], [301, 302]])
+        self.assertEqual(info, [['S1', 'S2'], ['S1', 'S2']])
+        self.assertEqual(m700.get_spindle_monitor([2]), [[201]])
+        m700.close()
+
+    def test_watch_devs_backend(self):
+        '''イテレータで指定したデバイスの変化が、周期を延ばさずに通知されるかテスト。'''
+        FakeEZCom.memory = {}
+        m700 = M700('127.0.0.1:683', backend=FakeEZCom)
+        stop_event = threading.Event()
+        changes = []
+        def on_change(dev, old, new):
+            changes.append((dev, old, new))
+            stop_event.set()
+        timer = threading.Timer(0.1, FakeEZCom.memory.update, ({'D200': 5},))
+        timeout = threading.Timer(5, stop_event.set)
+        timer.start()
+        timeout.start()
+        try:
+            stats = m700.watch_devs(iter(['M900', 'D200']), on_change, interval=0.01, stop_event=stop_event)
+        finally:
+            timer.join()
+            timeout.cancel()
+            m700.close()
+            FakeEZCom.memory = {}
+        self.assertEqual(changes, [('D200', 0, 5)])
+        self.assertEqual(stats['edges'], 1)
+
+    def test_device_type(self):
+        '''デバイス番号の解析テスト。'''
+        self.assertEqual(device_type('M900'), 1)
+        self.assertEqual(device_type('D200'), 4)
+        for dev in ('X100', 'M', 'D20A', ''):
+            with self.assertRaises(Exception):
+                device_type(dev)
+        with self.assertRaises(Exception):
+            M700.compile_devs(['M900', 'Y10'])
             
 if __name__ == '__main__':
     unittest.main()
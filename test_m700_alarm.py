@@ -0,0 +1,104 @@
+# coding: utf-8
+'''
+本テストはアラーム履歴の記録のテストスクリプトです。
+
+NCの代わりに固定のアラーム文字列を返すオブジェクトを利用するため、NCへの接続は不要です。
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from m700_alarm import AlarmLog, AlarmTracker, split_alarms
+
+
+class FakeM700():
+    '''get_alerm()で、設定したアラーム文字列を返す。'''
+    alarm = ''
+
+    def get_alerm(self):
+        return self.alarm
+
+
+class TestAlarm(unittest.TestCase):
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'alarm')
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        shutil.rmtree(self.dir)
+
+    def test_split_alarms(self):
+        '''アラーム文字列の分割テスト。'''
+        self.assertEqual(split_alarms('M01 0001\r\nZ31 0002\r\n\r\n'), ['M01 0001', 'Z31 0002'])
+        self.assertEqual(split_alarms(''), [])
+
+    def test_tracker(self):
+        '''発生・解除のイベントだけが記録されるかテスト。'''
+        m700 = FakeM700()
+        log = AlarmLog(self.path)
+        tracker = AlarmTracker(m700, 'host1', log)
+        m700.alarm = 'A\r\nB'
+        self.assertEqual([e[2:] for e in tracker.poll()], [(AlarmLog.RAISE, 'A'), (AlarmLog.RAISE, 'B')])
+        self.assertEqual(tracker.poll(), [])
+        m700.alarm = 'B'
+        self.assertEqual([e[2:] for e in tracker.poll()], [(AlarmLog.CLEAR, 'A')])
+        m700.alarm = 'A\r\nB'
+        tracker.poll()
+        self.assertEqual(tracker.counts(), {'A': 2, 'B': 1})
+        self.assertEqual(tracker.active(), {'A', 'B'})
+        log.close()
+
+        # 開き直しても辞書とレコードが引き継がれる
+        log = AlarmLog(self.path)
+        self.assertEqual(len(log.query('host1', 0, float('inf'))), 4)
+        log.close()
+
+    def test_partial_record(self):
+        '''途中まで書き込まれたレコードが捨てられ、以降の追記がずれないかテスト。'''
+        log = AlarmLog(self.path)
+        log.append(100.0, 'host1', AlarmLog.RAISE, 'A')
+        log.close()
+        with open(self.path + '.log', 'ab') as f:
+            f.write(b'\x00' * 7)
+        log = AlarmLog(self.path)
+        log.append(200.0, 'host1', AlarmLog.CLEAR, 'A')
+        self.assertEqual(log.query('host1', 0, float('inf')), [(100.0, AlarmLog.RAISE, 'A'), (200.0, AlarmLog.CLEAR, 'A')])
+        log.close()
+        self.assertEqual(os.path.getsize(self.path + '.log'), 40)
+
+    def test_partial_dict_line(self):
+        '''途中まで書き込まれた辞書の行が捨てられ、以降の番号がずれないかテスト。'''
+        log = AlarmLog(self.path)
+        log.append(100.0, 'host1', AlarmLog.RAISE, 'A')
+        log.close()
+        for partial in ('2\tB', '2'):
+            with open(self.path + '.dict', 'a', encoding='utf-8') as f:
+                f.write(partial)
+            log = AlarmLog(self.path)
+            log.close()
+        log = AlarmLog(self.path)
+        log.append(200.0, 'host1', AlarmLog.RAISE, 'C')
+        log.close()
+        log = AlarmLog(self.path)
+        self.assertEqual(log.query('host1', 0, float('inf')), [(100.0, AlarmLog.RAISE, 'A'), (200.0, AlarmLog.RAISE, 'C')])
+        log.close()
+
+    def test_query(self):
+        '''ホストと期間を指定した検索のテスト。'''
+        log = AlarmLog(self.path)
+        for t in range(100):
+            log.append(float(t), 'host1' if t % 2 else 'host2', AlarmLog.RAISE, 'alarm{}'.format(t % 5))
+        result = log.query('host1', 10, 20)
+        self.assertEqual([r[0] for r in result], [11.0, 13.0, 15.0, 17.0, 19.0])
+        self.assertEqual(result[0][2], 'alarm1')
+        self.assertEqual(log.query('host3', 0, 100), [])
+        self.assertEqual(log.query('host2', 200, 300), [])
+        log.close()
+        self.assertEqual(os.path.getsize(self.path + '.log'), 100 * 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# coding: utf-8
+'''
+本テストは三菱M700のasyncioラッパーのテストスクリプトです。
+
+※注意　デバイスの操作によって、物理的な機械が動く可能性があります。
+      必ず安全を確かめ、テストコード内の操作を理解した上で実行して下さい。
+'''
+import asyncio
+import unittest
+from unittest import mock
+
+from m700 import M700
+from m700_async import AsyncM700
+
+
+class TestAsyncM700(unittest.TestCase):
+
+    HOST = '192.168.48.173:683'
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.m700 = AsyncM700(self.HOST, timeout=10)
+        if not asyncio.run(self.m700.is_open()):
+            self.skipTest('指定されたIPに接続できません。電源が入っていない可能性があります。')
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        asyncio.run(self.m700.close())
+
+    def test_result_type(self):
+        '''非同期版の各メソッドが同期版と同じ型を返すかテスト。'''
+        async def run():
+            return await AsyncM700.gather(
+                self.m700.get_version(),
+                self.m700.get_run_status(),
+                self.m700.get_rpm(),
+                self.m700.get_alerm())
+        version, status, rpm, alerm = asyncio.run(run())
+        self.assertIs(type(version), str)
+        self.assertIs(type(status), M700.RunStatus)
+        self.assertIs(type(rpm), int)
+        self.assertIs(type(alerm), str)
+
+    def test_timeout(self):
+        '''タイムアウトが指定時間で発生するかテスト。'''
+        async def run():
+            return await self.m700.find_dir('M01:¥PRG¥USER¥', timeout=0)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run())
+
+
+class TestAsyncM700Close(unittest.TestCase):
+    '''NCに接続せずに実行できるテスト。'''
+
+    class FakeM700():
+        def __init__(self):
+            self.closed = 0
+        def is_open(self):
+            return True
+        def close(self):
+            self.closed += 1
+
+    def test_shared_executor(self):
+        '''同一ホストの一方をcloseしても、もう一方が使えるかテスト。'''
+        fake = self.FakeM700()
+        async def run():
+            m1 = AsyncM700('10.0.0.1:683')
+            m2 = AsyncM700('10.0.0.1:683')
+            await m1.close()
+            await m1.close()
+            self.assertEqual(fake.closed, 0)
+            self.assertTrue(await m2.is_open())
+            await m2.close()
+            self.assertEqual(fake.closed, 1)
+            m3 = AsyncM700('10.0.0.1:683')
+            self.assertTrue(await m3.is_open())
+            await m3.close()
+        with mock.patch.object(M700, 'get_connection', return_value=fake):
+            asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# coding: utf-8
+'''
+本テストは三菱M700の一括収集のテストスクリプトです。
+'''
+import functools
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from multiprocessing import shared_memory
+
+from m700 import M700
+from m700_collector import Collector, _Table
+from test_m700_trace import FakeEZCom
+
+
+class CrashingEZCom(FakeEZCom):
+    '''最初に生成されたプロセスだけ、主軸モニタの読み出し時にプロセスを異常終了させる。'''
+
+    def __init__(self, marker):
+        self.marker = marker
+
+    def Monitor_GetSpindleMonitor(self, param, spindle):
+        if not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            os._exit(1)
+        return super().Monitor_GetSpindleMonitor(param, spindle)
+
+
+class TestCollector(unittest.TestCase):
+
+    HOST = '192.168.48.173:683'
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        m700 = M700.get_connection(self.HOST)
+        if not m700.is_open():
+            self.skipTest('指定されたIPに接続できません。電源が入っていない可能性があります。')
+
+    def collect(self, mode):
+        with Collector([self.HOST], ['get_rpm', 'get_load', 'M900'], interval=0.1, mode=mode, workers=1) as collector:
+            time.sleep(2)
+            return collector.read(self.HOST)
+
+    def test_thread_mode(self):
+        '''スレッド方式で値が共有メモリに書き込まれるかテスト。'''
+        result = self.collect(Collector.Mode.THREAD)
+        self.assertTrue(result['ok'])
+        self.assertGreater(result['count'], 0)
+        self.assertEqual(list(result['values']), ['get_rpm', 'get_load', 'M900'])
+
+    def test_process_mode(self):
+        '''プロセス方式で値が共有メモリに書き込まれるかテスト。'''
+        result = self.collect(Collector.Mode.PROCESS)
+        self.assertTrue(result['ok'])
+        self.assertGreater(result['count'], 0)
+
+
+class TestCollectorOffline(unittest.TestCase):
+    '''NCの代わりに簡易的なCOMオブジェクトを利用するテスト。'''
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        shutil.rmtree(self.dir)
+
+    def test_restart(self):
+        '''異常終了したワーカープロセスが再起動され、収集が再開されるかテスト。'''
+        hosts = ['127.0.0.1:683', '127.0.0.2:683']
+        backend = functools.partial(CrashingEZCom, os.path.join(self.dir, 'crashed'))
+        with Collector(hosts, ['get_rpm', 'M900'], interval=0.01, workers=1, backend=backend) as collector:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                result = collector.read_all()
+                if collector.restarts() and all(r['count'] > 0 for r in result.values()):
+                    break
+                time.sleep(0.1)
+        self.assertEqual(collector.restarts(), 1)
+        for r in result.values():
+            self.assertTrue(r['ok'])
+            self.assertEqual(r['values'], {'get_rpm': 1200.0, 'M900': 0.0})
+
+
+class TestTable(unittest.TestCase):
+    '''共有メモリ上の結果テーブルのテスト。NCへの接続は不要。'''
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.shm = shared_memory.SharedMemory(create=True, size=_Table.size(2, 2))
+        self.table = _Table(self.shm.buf, 2)
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        del self.table
+        self.shm.close()
+        self.shm.unlink()
+
+    def test_write_read(self):
+        '''書き込んだ値が行ごとに読み出せるかテスト。'''
+        self.assertEqual(self.table.read(0), (0, 0.0, False, (0.0, 0.0)))
+        self.table.write(1, 5.0, True, [1.0, 2.0])
+        self.table.write(1, 6.0, True, [3.0, 4.0])
+        self.assertEqual(self.table.read(1), (2, 6.0, True, (3.0, 4.0)))
+        self.assertEqual(self.table.read(0), (0, 0.0, False, (0.0, 0.0)))
+
+    def test_torn_write(self):
+        '''書き込み中に異常終了した行（seqが奇数）が、次の書き込みで読み出せる状態に戻るかテスト。'''
+        self.table.write(0, 5.0, True, [1.0, 2.0])
+        struct.pack_into('<Q', self.shm.buf, 0, 3)
+        with self.assertRaises(Exception):
+            self.table.read(0, timeout=0.01)
+        self.table.write(0, 6.0, True, [3.0, 4.0])
+        self.assertEqual(self.table.read(0, timeout=0.01), (2, 6.0, True, (3.0, 4.0)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# coding: utf-8
+'''
+本テストは時系列データの出力のテストスクリプトです。NCへの接続は不要です。
+'''
+import csv
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from m700_export import Exporter
+
+
+class TestExporter(unittest.TestCase):
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'data')
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        shutil.rmtree(self.dir)
+
+    def read_csv(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            return list(csv.reader(f))
+
+    def test_csv(self):
+        '''gzip圧縮CSVへの出力とローテーションのテスト。'''
+        with Exporter(self.path, ['get_rpm', 'get_load'], batch_rows=10, rotate_rows=20) as exporter:
+            for i in range(45):
+                if i % 2:
+                    exporter.add({'get_rpm': i, 'get_load': i * 2}, timestamp=float(i))
+                else:
+                    exporter.add([i, i * 2], timestamp=float(i))
+        files = exporter.files()
+        self.assertEqual([os.path.basename(f) for f in files], ['data_00000.csv.gz', 'data_00001.csv.gz', 'data_00002.csv.gz'])
+        rows = [self.read_csv(f) for f in files]
+        self.assertEqual(rows[0][0], ['timestamp', 'get_rpm', 'get_load'])
+        self.assertEqual(rows[0][1], ['0.0', '0', '0'])
+        self.assertEqual([len(r) - 1 for r in rows], [20, 20, 5])
+        self.assertEqual(rows[2][-1], ['44.0', '44', '88'])
+        self.assertEqual(exporter.dropped(), 0)
+
+    def test_flush(self):
+        '''flushで溜めている値が書き出されるかテスト。'''
+        exporter = Exporter(self.path, ['M900'], batch_rows=1000)
+        exporter.add([1])
+        exporter.flush()
+        self.assertEqual(len(exporter.files()), 1)
+        exporter.close()
+        self.assertEqual(self.read_csv(exporter.files()[0])[1][1], '1')
+
+    def test_invalid_row(self):
+        '''列の数と値の数が一致しない行でエラーとなるかテスト。'''
+        with Exporter(self.path, ['get_rpm', 'get_load']) as exporter:
+            with self.assertRaises(Exception):
+                exporter.add([1])
+            exporter.add([2, 20], timestamp=2.0)
+        self.assertEqual(self.read_csv(exporter.files()[0])[1:], [['2.0', '2', '20']])
+
+    def test_parquet(self):
+        '''Parquetへの出力と、指定した列の型のテスト。'''
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest('pyarrowがインストールされていません。')
+        with Exporter(self.path, ['get_rpm', 'alarm'], format=Exporter.Format.PARQUET,
+                      batch_rows=2, types={'alarm': 'string'}) as exporter:
+            exporter.add([None, None], timestamp=1.0)
+            exporter.add({'get_rpm': 1200, 'alarm': 'M01 0001'}, timestamp=2.0)
+            exporter.add([1300, ''], timestamp=3.0)
+        files = exporter.files()
+        self.assertEqual([os.path.basename(f) for f in files], ['data_00000.parquet'])
+        table = pyarrow.parquet.read_table(files[0])
+        # 最初のバッチが全てNoneでも、スキーマは指定した型になる
+        self.assertEqual([str(t) for t in table.schema.types], ['double', 'double', 'string'])
+        self.assertEqual(table.to_pydict(), {
+            'timestamp': [1.0, 2.0, 3.0],
+            'get_rpm': [None, 1200.0, 1300.0],
+            'alarm': [None, 'M01 0001', '']
+        })
+        self.assertEqual(pyarrow.parquet.ParquetFile(files[0]).num_row_groups, 2)
+
+    def test_invalid_format(self):
+        '''不正な出力形式の指定でエラーとなるかテスト。'''
+        with self.assertRaises(Exception):
+            Exporter(self.path, ['M900'], format='xlsx')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# coding: utf-8
+'''
+本テストは三菱M700の定期問い合わせスケジューラのテストスクリプトです。
+'''
+import threading
+import time
+import unittest
+from unittest import mock
+
+from m700 import M700
+from m700_scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    HOST = '192.168.48.173:683'
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        m700 = M700.get_connection(self.HOST)
+        if not m700.is_open():
+            self.skipTest('指定されたIPに接続できません。電源が入っていない可能性があります。')
+
+    def test_subscribe(self):
+        '''同一の問い合わせがまとめられ、最新値が取得できるかテスト。'''
+        scheduler = Scheduler(max_calls_per_sec=20)
+        alarm1 = scheduler.subscribe(self.HOST, 'get_alerm', period=0.2, priority=10)
+        alarm2 = scheduler.subscribe(self.HOST, 'get_alerm', period=1.0)
+        devs = scheduler.subscribe(self.HOST, Scheduler.DEVICES, ['M900', 'D200'], period=0.1)
+        with scheduler:
+            time.sleep(2)
+        self.assertIs(type(scheduler.get(alarm1)), str)
+        self.assertEqual(scheduler.get(alarm1), scheduler.get(alarm2))
+        self.assertEqual(len(scheduler.get(devs)), 2)
+
+        stats = scheduler.stats()
+        self.assertEqual(len(stats), 2)
+        alarm = [s for s in stats if s['method'] == 'get_alerm'][0]
+        self.assertEqual(alarm['period'], 0.2)
+        self.assertEqual(alarm['subscribers'], 2)
+        self.assertIsNotNone(alarm['achieved'])
+
+
+class TestSchedulerOffline(unittest.TestCase):
+    '''NCの代わりに簡易的な接続を利用するテスト。'''
+
+    class FakeM700():
+        '''呼び出しと時刻を記録し、固定の値を返す。'''
+        VALUES = {'M900': 1, 'D200': 2}
+
+        def __init__(self):
+            self.calls = []
+            self.called = threading.Event()
+
+        def __record(self, *call):
+            self.calls.append((time.monotonic(),) + call)
+            if len(self.calls) >= 4:
+                self.called.set()
+
+        def get_alerm(self):
+            self.__record('get_alerm')
+            return 'alarm'
+
+        def read_devs(self, devs):
+            self.__record('read_devs', list(devs))
+            return [self.VALUES[dev] for dev in devs]
+
+        def get_spindle_monitor(self, params, spindles=(1,)):
+            self.__record('get_spindle_monitor', params, spindles)
+            return [[param * 100 + spindle for spindle in spindles] for param in params]
+
+        def close(self):
+            pass
+
+    def test_merge_and_priority(self):
+        '''優先度順に実行され、デバイスの問い合わせがまとめられ、COM呼び出し回数で間隔が空くかテスト。'''
+        fake = self.FakeM700()
+        scheduler = Scheduler(max_calls_per_sec=20)
+        host = '127.0.0.1:683'
+        m900 = scheduler.subscribe(host, Scheduler.DEVICES, ['M900'], period=0.01)
+        both = scheduler.subscribe(host, Scheduler.DEVICES, ['D200', 'M900'], period=0.01)
+        alarm = scheduler.subscribe(host, 'get_alerm', period=10.0, priority=10)
+        with mock.patch.object(M700, 'get_connection', return_value=fake):
+            with scheduler:
+                self.assertTrue(fake.called.wait(5))
+        self.assertEqual([c[1:] for c in fake.calls[:2]], [('get_alerm',), ('read_devs', ['M900', 'D200'])])
+        self.assertEqual(scheduler.get(m900), [1])
+        self.assertEqual(scheduler.get(both), [2, 1])
+        self.assertEqual(scheduler.get(alarm), 'alarm')
+        # read_devsはCOM呼び出し3回分（20回/秒なら0.15秒）の間隔を空ける
+        self.assertGreaterEqual(fake.calls[2][0] - fake.calls[1][0], 0.14)
+
+    def test_list_args(self):
+        '''リストの引数で登録でき、同じ内容のリストとtupleが1つにまとめられるかテスト。'''
+        fake = self.FakeM700()
+        scheduler = Scheduler(max_calls_per_sec=100)
+        host = '127.0.0.1:683'
+        monitor1 = scheduler.subscribe(host, 'get_spindle_monitor', [2, 3], [1, 2], period=0.01)
+        monitor2 = scheduler.subscribe(host, 'get_spindle_monitor', (2, 3), (1, 2), period=0.01)
+        self.assertEqual(len(scheduler.stats()), 1)
+        with mock.patch.object(M700, 'get_connection', return_value=fake):
+            with scheduler:
+                self.assertTrue(fake.called.wait(5))
+        self.assertEqual(scheduler.get(monitor1), [[201, 202], [301, 302]])
+        self.assertEqual(scheduler.get(monitor2), scheduler.get(monitor1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# coding: utf-8
+'''
+本テストは信号の定義ファイルによるデバイス操作のテストスクリプトです。
+
+NCの代わりにデバイスの値を保持する簡易的なCOMオブジェクト（test_m700_trace.FakeEZCom）を利用するため、NCへの接続は不要です。
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from m700 import M700
+from m700_signals import SignalMap
+from test_m700_trace import FakeEZCom
+
+
+DEFINITION = {
+    'signals': {
+        'cycle_start': {'dev': 'M900'},
+        'feed_override': {'dev': 'D200', 'scale': 0.1},
+        'status': {'dev': 'D210', 'bits': {'door_open': 0, 'coolant': 3}},
+        'status_raw': {'dev': 'D210'}
+    },
+    'groups': {
+        'cycle': ['cycle_start', 'feed_override', 'status', 'status_raw']
+    }
+}
+
+
+class TestSignalMap(unittest.TestCase):
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        self.dir = tempfile.mkdtemp()
+        FakeEZCom.memory = {'M900': 1, 'D200': 1000, 'D210': 0b1001}
+        self.m700 = M700('127.0.0.1:683', backend=FakeEZCom)
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        self.m700.close()
+        FakeEZCom.memory = {}
+        shutil.rmtree(self.dir)
+
+    def write_file(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_read_group(self):
+        '''グループの読み出しと、スケーリング・ビット分解のテスト。'''
+        signals = SignalMap(DEFINITION)
+        self.assertEqual(signals.group('cycle').request.devs, ('M900', 'D200', 'D210'))
+        self.assertEqual(signals.read_group(self.m700, 'cycle'), {
+            'cycle_start': 1,
+            'feed_override': 100.0,
+            'status': {'door_open': True, 'coolant': True},
+            'status_raw': 9
+        })
+
+    def test_write(self):
+        '''スケーリングを逆変換した書き込みのテスト。'''
+        signals = SignalMap(DEFINITION)
+        signals.write(self.m700, {'cycle_start': 0, 'feed_override': 50.0})
+        self.assertEqual(self.m700.read_devs(['M900', 'D200']), [0, 500])
+        with self.assertRaises(Exception):
+            signals.write(self.m700, {'status': 1})
+
+    def test_load(self):
+        '''JSON、CSVの定義ファイルの読み込みテスト。'''
+        path = self.write_file('signals.json', json.dumps(DEFINITION))
+        self.assertEqual(SignalMap.load(path).read_group(self.m700, 'cycle')['feed_override'], 100.0)
+
+        path = self.write_file('signals.csv', 'name,dev,scale,offset,bits,groups\n'
+                                              'cycle_start,M900,,,,cycle\n'
+                                              'feed_override,D200,0.1,,,cycle;feed\n'
+                                              'status,D210,,,door_open:0;coolant:3,cycle\n')
+        signals = SignalMap.load(path)
+        self.assertEqual(signals.read_group(self.m700, 'feed'), {'feed_override': 100.0})
+        self.assertEqual(signals.read_group(self.m700, 'cycle')['status'], {'door_open': True, 'coolant': True})
+
+    def test_load_yaml(self):
+        '''YAMLの定義ファイルの読み込みテスト。'''
+        try:
+            import yaml
+        except ImportError:
+            self.skipTest('PyYAMLがインストールされていません。')
+        path = self.write_file('signals.yaml', 'signals:\n'
+                                               '  cycle_start: {dev: M900}\n'
+                                               '  status: {dev: D210, bits: {door_open: 0}}\n'
+                                               'groups:\n'
+                                               '  cycle: [cycle_start, status]\n')
+        self.assertEqual(SignalMap.load(path).read_group(self.m700, 'cycle'),
+                         {'cycle_start': 1, 'status': {'door_open': True}})
+
+    def test_invalid_definition(self):
+        '''不正な定義が読み込み時に検出されるかテスト。'''
+        invalids = [
+            {'signals': {'a': {'dev': 'X100'}}},
+            {'signals': {'a': {'dev': 'M1A'}}},
+            {'signals': {'a': {}}},
+            {'signals': {'a': {'dev': 'M900', 'bits': {'b': 0}}}},
+            {'signals': {'a': {'dev': 'D200', 'bits': {'b': 16}}}},
+            {'signals': {'a': {'dev': 'D200', 'scale': 0}}},
+            {'signals': {'a': {'dev': 'M900'}}, 'groups': {'g': ['a', 'b']}}
+        ]
+        for definition in invalids:
+            with self.assertRaises(Exception):
+                SignalMap(definition)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# coding: utf-8
+'''
+本テストはEZSocketのCOM呼び出しの記録と再生のテストスクリプトです。
+
+NCの代わりに簡易的なCOMオブジェクトを利用するため、NCへの接続やpywin32は不要です。
+'''
+import os
+import tempfile
+import unittest
+
+from m700 import M700
+from m700_trace import ReplayEZCom, TraceWriter
+
+
+class FakeEZCom():
+    '''EZSocketのCOMオブジェクトの代わりに、固定の値を返す。他のテストスクリプトからも利用する。
+
+    デバイスの値はクラス属性memoryの辞書で保持する。未設定のデバイスは0。
+    '''
+    memory = {}
+
+    def SetTCPIPProtocol(self, ip, port):
+        return 0
+
+    def Open2(self, machine, unitno, timeout, host):
+        return 0
+
+    def Close(self):
+        return 0
+
+    def Release(self):
+        return 0
+
+    def Monitor_GetSpindleMonitor(self, param, spindle):
+        return 0, 1200 if param == 2 else 35, ''
+
+    def Device_SetDevice(self, devs, types, values):
+        self.devs, self.values = devs, values
+        return 0
+
+    def Device_Read(self):
+        return 0, tuple(self.memory.get(dev, 0) for dev in self.devs)
+
+    def Device_Write(self):
+        self.memory.update(zip(self.devs, self.values))
+        return 0
+
+    def Device_DeleteAll(self):
+        return 0
+
+    def File_OpenFile3(self, path, mode):
+        return 0
+
+    def File_ReadFile2(self, size):
+        return 0, b'G00X0.'
+
+    def File_CloseFile2(self):
+        return 0
+
+    def File_FindDir2(self, path, mode):
+        self.path = path
+        return 2, 'SUB\t0' if mode == -1 else '100\t19\tCOMMENT'
+
+    def File_FindNextDir2(self):
+        return 0, ''
+
+    def File_ResetDir(self):
+        return 0
+
+
+class TestTrace(unittest.TestCase):
+
+    HOST = '127.0.0.1:683'
+
+    def setUp(self):
+        '''テストごとに開始前に必ず実行'''
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        '''テストごとに終了後に必ず実行'''
+        os.remove(self.path)
+
+    def record(self):
+        m700 = M700(self.HOST, backend=FakeEZCom)
+        m700.start_recording(self.path)
+        result = (m700.get_rpm(), m700.get_load(), m700.read_devs(['M900', 'D200']), m700.read_file('M01:¥PRG¥USER¥100'))
+        m700.stop_recording()
+        return result
+
+    def test_record_and_replay(self):
+        '''記録した戻り値が再生で同じように返るかテスト。'''
+        recorded = self.record()
+        m700 = M700(self.HOST, backend=lambda: ReplayEZCom(self.path, self.HOST, speed=None))
+        # 記録と逆の順に呼び出しても、引数ごとに記録した戻り値が返る
+        replayed = (m700.get_rpm(), m700.get_load(), m700.read_devs(['M900', 'D200']), m700.read_file('M01:¥PRG¥USER¥100'))
+        reversed_order = (m700.get_load(), m700.get_rpm())
+        m700.close()
+        self.assertEqual(recorded, (1200, 35, [0, 0], b'G00X0.'))
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(reversed_order, (35, 1200))
+
+    def test_replay_other_unitno(self):
+        '''記録時と再生時でユニット番号が異なっても再生できるかテスト。'''
+        held = M700.alloc_unitno()
+        try:
+            m700 = M700(self.HOST, backend=FakeEZCom)
+            m700.start_recording(self.path)
+            recorded = m700.find_dir('M01:¥PRG¥USER¥')
+            m700.stop_recording()
+        finally:
+            M700.release_unitno(held)
+        m700 = M700(self.HOST, backend=lambda: ReplayEZCom(self.path, self.HOST, speed=None))
+        replayed = m700.find_dir('M01:¥PRG¥USER¥')
+        m700.close()
+        self.assertEqual(len(recorded), 2)
+        self.assertEqual(replayed, recorded)
+
+    def test_replay_unknown_args(self):
+        '''記録に無い引数での呼び出しが例外になるかテスト。'''
+        self.record()
+        replay = ReplayEZCom(self.path, self.HOST, speed=None)
+        self.assertEqual(replay.Monitor_GetSpindleMonitor(3, 1), (0, 35, ''))
+        with self.assertRaises(Exception):
+            replay.Monitor_GetSpindleMonitor(3, 2)
+        with self.assertRaises(Exception):
+            replay.File_OpenFile3('M01:¥PRG¥USER¥200', 1)
+
+    def test_shared_writer(self):
+        '''複数の接続で1つのトレースを共有し、ホストごとに再生できるかテスト。'''
+        writer = TraceWriter(self.path)
+        for host in ('127.0.0.1:683', '127.0.0.2:683'):
+            m700 = M700(host, backend=FakeEZCom)
+            m700.start_recording(writer)
+            m700.get_rpm()
+            m700.stop_recording()
+        writer.close()
+        replay = ReplayEZCom(self.path, '127.0.0.2:683', speed=None, loop=False)
+        self.assertEqual(replay.Monitor_GetSpindleMonitor(2, 1), (0, 1200, ''))
+        with self.assertRaises(Exception):
+            replay.Monitor_GetSpindleMonitor(2, 1)
+
+if __name__ == '__main__':
+    unittest.main()